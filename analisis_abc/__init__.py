@@ -0,0 +1,95 @@
+"""Cálculos del análisis ABC de repuestos, separados de la interfaz Streamlit."""
+
+from analisis_abc.diagnostico import Diagnostico
+from analisis_abc.escenarios import UMBRALES_BARRIDO, BarridoABC, barrido_abc, metricas_escenario
+from analisis_abc.exportar import libro_excel_abc
+from analisis_abc.filtros import IndiceFiltros
+from analisis_abc.graficos import figura_abc, imagen_abc_png
+from analisis_abc.historial import HistorialMovimientos
+from analisis_abc.ingesta import LibroSAP, compactar_libro, huella_contenido, informe_memoria, leer_libro_sap
+from analisis_abc.lote import (
+    combinaciones_disponibles,
+    libro_lote_excel,
+    procesar_lote,
+    tabla_resumen_lote,
+)
+from analisis_abc.movimientos import agregar_columnas_movimiento, anios_movimiento, construir_indice_movimientos
+from analisis_abc.paginacion import PaginaTabla, paginar_tabla
+from analisis_abc.proceso import (
+    COLUMNAS_FILTRO,
+    COLUMNAS_PROCESO_FIN,
+    COLUMNAS_PROCESO_INICIO,
+    COLUMNAS_RESUMEN,
+    CONTEOS_FILTRO,
+    UMBRALES_ZONAS,
+    Agregados,
+    ResultadoABC,
+    agregar_movimientos,
+    anios_de_tabla,
+    calcular_cantidad_a_comprar,
+    clasificar_abc,
+    columnas_proceso,
+    construir_agregados,
+    filtrar_materiales,
+    procesar_area,
+    quitar_con_solicitud,
+    resumen_abc,
+)
+from analisis_abc.solicitudes import buscar_solicitud_pedido, construir_indice_solicitudes
+from analisis_abc.stock import (
+    agregar_stock_total_vnv,
+    calcular_cant_comp,
+    calcular_porcentual,
+    construir_tabla_stock,
+)
+
+__all__ = [
+    'Agregados',
+    'BarridoABC',
+    'COLUMNAS_FILTRO',
+    'COLUMNAS_PROCESO_FIN',
+    'COLUMNAS_PROCESO_INICIO',
+    'COLUMNAS_RESUMEN',
+    'CONTEOS_FILTRO',
+    'Diagnostico',
+    'HistorialMovimientos',
+    'IndiceFiltros',
+    'LibroSAP',
+    'PaginaTabla',
+    'ResultadoABC',
+    'UMBRALES_BARRIDO',
+    'UMBRALES_ZONAS',
+    'agregar_columnas_movimiento',
+    'agregar_movimientos',
+    'agregar_stock_total_vnv',
+    'anios_de_tabla',
+    'anios_movimiento',
+    'barrido_abc',
+    'buscar_solicitud_pedido',
+    'calcular_cant_comp',
+    'calcular_cantidad_a_comprar',
+    'calcular_porcentual',
+    'clasificar_abc',
+    'columnas_proceso',
+    'combinaciones_disponibles',
+    'compactar_libro',
+    'construir_agregados',
+    'construir_indice_movimientos',
+    'construir_indice_solicitudes',
+    'construir_tabla_stock',
+    'figura_abc',
+    'filtrar_materiales',
+    'huella_contenido',
+    'imagen_abc_png',
+    'informe_memoria',
+    'leer_libro_sap',
+    'libro_excel_abc',
+    'libro_lote_excel',
+    'metricas_escenario',
+    'paginar_tabla',
+    'procesar_area',
+    'procesar_lote',
+    'quitar_con_solicitud',
+    'resumen_abc',
+    'tabla_resumen_lote',
+]
@@ -0,0 +1,5 @@
+import sys
+
+from analisis_abc.cli import main
+
+sys.exit(main())
@@ -0,0 +1,88 @@
+"""Ejecución del análisis ABC sin navegador.
+
+Ejemplos:
+    python -m analisis_abc libro.xlsx --quien-compra Logística --tipo-material ZREP --area Planta
+    python -m analisis_abc libro.xlsx --lote --salida resultados/
+"""
+
+import argparse
+import re
+import sys
+from pathlib import Path
+
+from analisis_abc.exportar import libro_excel_abc
+from analisis_abc.graficos import imagen_abc_png
+from analisis_abc.historial import HistorialMovimientos
+from analisis_abc.ingesta import MOTORES, leer_libro_sap
+from analisis_abc.lote import combinaciones_disponibles, libro_lote_excel, procesar_lote, tabla_resumen_lote
+from analisis_abc.movimientos import anios_movimiento
+from analisis_abc.proceso import COLUMNAS_RESUMEN, construir_agregados
+
+_CARACTERES_NO_VALIDOS_ARCHIVO = re.compile(r'[<>:"/\\|?*\s]+')
+
+
+def _nombre_archivo(*partes):
+    return '_'.join(_CARACTERES_NO_VALIDOS_ARCHIVO.sub('-', str(p)).strip('-') for p in partes)
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog='python -m analisis_abc', description='Análisis ABC de repuestos - SAP')
+    parser.add_argument('archivo', type=Path, help='libro .xlsx con las hojas ZMM009, MB51 y SC')
+    parser.add_argument('--quien-compra', nargs='+', help='valores de Quien Compra (por defecto todos)')
+    parser.add_argument('--tipo-material', nargs='+', help='valores de Tipo material (por defecto todos)')
+    parser.add_argument('--area', nargs='+', help='valores de Area Solicitantes (por defecto todas)')
+    parser.add_argument('--salida', type=Path, default=Path('.'), help='carpeta de salida (por defecto la actual)')
+    parser.add_argument('--lote', action='store_true',
+                        help='un único libro con todas las combinaciones en vez de un Excel y un PNG por combinación')
+    parser.add_argument('--motor', choices=MOTORES, help='lector de Excel (por defecto el más rápido instalado)')
+    parser.add_argument('--procesos', type=int, default=1, help='procesos para la clasificación ABC por grupo')
+    parser.add_argument('--desde', type=int, help='primer ejercicio de las columnas Ingreso/Salida {año}')
+    parser.add_argument('--hasta', type=int, help='último ejercicio de las columnas Ingreso/Salida {año}')
+    parser.add_argument('--historial', type=Path,
+                        help='carpeta del historial MB51: se agregan los movimientos nuevos del libro '
+                             'y se usan todos los guardados')
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+
+    libro = leer_libro_sap(args.archivo.read_bytes(), motor=args.motor)
+    print(f"Registros cargados - ZMM009: {len(libro.zm009)} | MB51: {len(libro.mb51)} | SC: {len(libro.sc)}")
+
+    combinaciones = combinaciones_disponibles(libro.zm009, args.quien_compra, args.tipo_material, args.area)
+    if not combinaciones:
+        print("No se encontraron materiales con los filtros aplicados.", file=sys.stderr)
+        return 1
+
+    indice_movimientos = None
+    if args.historial:
+        historial = HistorialMovimientos(args.historial)
+        print(f"Movimientos nuevos en el historial: {historial.agregar(libro.mb51)}")
+        indice_movimientos = historial.indice()
+
+    agregados = construir_agregados(*libro, indice_movimientos=indice_movimientos)
+    anios = anios_movimiento(agregados.indice_movimientos, args.desde, args.hasta)
+    resultados = procesar_lote(libro.zm009, agregados, combinaciones, anios, procesos=args.procesos)
+    args.salida.mkdir(parents=True, exist_ok=True)
+
+    if args.lote:
+        destino = args.salida / 'analisis_abc_lote.xlsx'
+        destino.write_bytes(libro_lote_excel(resultados))
+        print(tabla_resumen_lote(resultados).to_string(index=False))
+        print(f"Escrito {destino}")
+        return 0
+
+    for (quien_compra, tipo_material, area), resultado in resultados.items():
+        etiqueta = f"{quien_compra} / {tipo_material} / {area}"
+        if resultado.resumen is None:
+            print(f"{etiqueta}: sin materiales a comprar ({resultado.conteos})")
+            continue
+
+        resumen_final = resultado.resumen[COLUMNAS_RESUMEN]
+        imagen_png = imagen_abc_png(resumen_final, f'Análisis ABC - {area}')
+        nombre = _nombre_archivo('analisis_abc', quien_compra, tipo_material, area)
+        (args.salida / f'{nombre}.png').write_bytes(imagen_png)
+        (args.salida / f'{nombre}.xlsx').write_bytes(libro_excel_abc(resultado.tabla, resumen_final, imagen_png))
+        print(f"{etiqueta}: {len(resultado.tabla)} materiales -> {args.salida / nombre}.xlsx")
+    return 0
@@ -0,0 +1,92 @@
+"""Medición ligera de cada etapa del pipeline: tiempo, filas y memoria.
+
+Cada etapa se mide con perf_counter y con la memoria residente del proceso
+antes y después, sin tracemalloc, para poder dejarla activa en producción.
+Las medidas se guardan en el objeto y se emiten como una línea JSON en el
+logger 'analisis_abc.diagnostico'.
+"""
+
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+COLUMNAS_DIAGNOSTICO = ['etapa', 'segundos', 'filas_entrada', 'filas_salida', 'memoria_mb']
+
+try:
+    _PAGINA_BYTES = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGINA_BYTES = None
+
+
+def memoria_residente_mb():
+    """Memoria residente del proceso en MB, o None si no puede leerse.
+
+    Usa psutil si está instalado y, si no, /proc/self/statm (Linux).
+    """
+    try:
+        import psutil
+    except ImportError:
+        pass
+    else:
+        return psutil.Process().memory_info().rss / 2**20
+
+    if _PAGINA_BYTES is None:
+        return None
+    try:
+        with open('/proc/self/statm', encoding='ascii') as f:
+            return int(f.read().split()[1]) * _PAGINA_BYTES / 2**20
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Diagnostico:
+    """Acumula las medidas de las etapas de una ejecución.
+
+    Uso:
+        diagnostico = Diagnostico()
+        with diagnostico.etapa('sc: búsqueda', filas_entrada=len(df)) as medida:
+            df = quitar_con_solicitud(df, indice)
+            medida['filas_salida'] = len(df)
+    """
+
+    def __init__(self, contexto=None):
+        self.contexto = dict(contexto or {})
+        self.etapas = []
+
+    @contextmanager
+    def etapa(self, nombre, filas_entrada=None):
+        medida = {'etapa': nombre, 'filas_entrada': filas_entrada, 'filas_salida': None}
+        memoria_inicial = memoria_residente_mb()
+        inicio = time.perf_counter()
+        try:
+            yield medida
+        finally:
+            medida['segundos'] = round(time.perf_counter() - inicio, 4)
+            memoria_final = memoria_residente_mb()
+            medida['memoria_mb'] = (round(memoria_final - memoria_inicial, 2)
+                                    if memoria_inicial is not None and memoria_final is not None else None)
+            self.etapas.append(medida)
+            if logger.isEnabledFor(logging.INFO):
+                registro = {**self.contexto, **medida}
+                logger.info(json.dumps(registro, ensure_ascii=False, default=str), extra={'diagnostico': registro})
+
+    def tabla(self):
+        """Las medidas como DataFrame, en orden de ejecución."""
+        tabla = pd.DataFrame(self.etapas, columns=COLUMNAS_DIAGNOSTICO)
+        return tabla.astype({'filas_entrada': 'Int64', 'filas_salida': 'Int64'})
+
+
+@contextmanager
+def medir_etapa(diagnostico, nombre, filas_entrada=None):
+    """diagnostico.etapa(...) o, si `diagnostico` es None, un dict que no se registra."""
+    if diagnostico is None:
+        yield {}
+    else:
+        with diagnostico.etapa(nombre, filas_entrada) as medida:
+            yield medida
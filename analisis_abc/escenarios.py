@@ -0,0 +1,152 @@
+"""Escenarios ABC: cómo cambian las zonas con otra métrica o con otros cortes.
+
+Se parte de la tabla ya procesada (con las columnas de movimientos por
+material), sin volver a ejecutar el pipeline. Por cada métrica se ordena y
+se acumula una sola vez; la zona de cada material para cada par de cortes
+sale de searchsorted sobre ese acumulado, para todos los cortes a la vez.
+"""
+
+import itertools
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from analisis_abc.proceso import UMBRALES_ZONAS, anios_de_tabla
+
+ZONAS = ['A', 'B', 'C']
+METRICA_BASE = 'Cant. Mov.'
+
+# Cortes (A, B) del barrido por defecto, en % del acumulado
+UMBRALES_BARRIDO = [(a, b) for a, b in itertools.product((70, 75, 80, 85), (90, 95)) if a < b]
+
+_MIGRACIONES = [(desde, hacia) for desde in ZONAS for hacia in ZONAS if desde != hacia]
+
+
+class BarridoABC(NamedTuple):
+    zonas: pd.DataFrame
+    comparacion: pd.DataFrame
+    migraciones: pd.DataFrame
+
+
+def metricas_escenario(tabla, anios_recientes=(1, 2, 3)):
+    """Métricas disponibles en `tabla` como {nombre: columnas que se suman}.
+
+    Además de 'Cant. Mov.' y 'Cant. Salida.', la salida de los últimos N
+    ejercicios presentes en la tabla, para cada N de `anios_recientes`.
+    """
+    metricas = {METRICA_BASE: [METRICA_BASE], 'Cant. Salida.': ['Cant. Salida.']}
+    anios = anios_de_tabla(tabla)
+    for n in anios_recientes:
+        if 0 < n <= len(anios):
+            recientes = anios[-n:]
+            nombre = f'Salida {recientes[0]}' if n == 1 else f'Salida {recientes[0]}-{recientes[-1]}'
+            metricas[nombre] = [f'Salida {anio}' for anio in recientes]
+    return metricas
+
+
+def _nombre_escenario(metrica, corte_a, corte_b):
+    return f'{metrica} {corte_a:g}/{corte_b:g}'
+
+
+def _zonas_por_corte(valores, cortes):
+    """Zonas (0 = A, 1 = B, 2 = C) de cada fila de `valores` (materiales x métricas)
+    para cada par de `cortes`, con forma (materiales, métricas, cortes).
+
+    Igual que clasificar_abc: se ordena de mayor a menor (estable, así una
+    tabla ya ordenada conserva su orden en los empates), A mientras el
+    % acumulado es menor que el primer corte y B mientras es menor que el
+    segundo. Con total 0 todo queda en A.
+    """
+    filas, columnas = valores.shape
+    orden = np.argsort(-valores, axis=0, kind='stable')
+    acumulado = np.take_along_axis(valores, orden, axis=0).cumsum(axis=0)
+    total = acumulado[-1] if filas else np.zeros(columnas)
+    porcentaje = np.zeros_like(acumulado)
+    np.divide(acumulado, total, out=porcentaje, where=total > 0)
+    porcentaje *= 100
+
+    # Materiales en A y en A+B por métrica y corte; el acumulado no decrece
+    hasta_a = np.empty((columnas, len(cortes)), dtype=np.intp)
+    hasta_b = np.empty((columnas, len(cortes)), dtype=np.intp)
+    for j in range(columnas):
+        hasta_a[j] = np.searchsorted(porcentaje[:, j], cortes[:, 0], side='left')
+        hasta_b[j] = np.searchsorted(porcentaje[:, j], cortes[:, 1], side='left')
+
+    posicion = np.empty_like(orden)
+    np.put_along_axis(posicion, orden, np.arange(filas)[:, None], axis=0)
+    posicion = posicion[:, :, None]
+    return (posicion >= hasta_a).astype(np.int8) + (posicion >= hasta_b)
+
+
+def barrido_abc(tabla, metricas=None, umbrales=None):
+    """Zonas ABC de `tabla` para cada combinación de métrica y cortes.
+
+    `metricas` es {nombre: columnas} (por defecto metricas_escenario(tabla))
+    y `umbrales` una lista de pares (corte A, corte B), por defecto
+    UMBRALES_BARRIDO. Las cantidades se toman en valor absoluto, porque MB51
+    puede registrar las salidas con signo negativo.
+
+    Devuelve un BarridoABC con:
+    - zonas: Material y una columna por escenario.
+    - comparacion: una fila por escenario con los materiales y el % de la
+      métrica en cada zona, y cuántos materiales cambian de zona respecto a
+      la clasificación base (Cant. Mov. con UMBRALES_ZONAS).
+    - migraciones: por escenario, cuántos materiales pasan de cada zona base
+      a otra zona.
+    """
+    metricas = metricas_escenario(tabla) if metricas is None else metricas
+    umbrales = UMBRALES_BARRIDO if umbrales is None else umbrales
+    for corte_a, corte_b in umbrales:
+        if not 0 <= corte_a <= corte_b <= 100:
+            raise ValueError(f"Cortes no válidos: {corte_a}/{corte_b} (se espera 0 <= A <= B <= 100)")
+
+    nombres = list(metricas)
+    valores = np.column_stack(
+        [np.abs(tabla[metricas[nombre]].to_numpy(dtype='float64').sum(axis=1)) for nombre in nombres]
+        + [tabla[METRICA_BASE].to_numpy(dtype='float64')]
+    ).reshape(len(tabla), len(nombres) + 1)
+    cortes = np.array(list(umbrales) + [UMBRALES_ZONAS], dtype='float64').reshape(-1, 2)
+
+    # La última métrica y el último par de cortes son los de la clasificación base
+    zonas = _zonas_por_corte(valores, cortes)
+    base = zonas[:, -1, -1]
+    escenarios = list(itertools.product(nombres, umbrales))
+    cantidad = len(escenarios)
+    zonas = zonas[:, :-1, :-1].reshape(len(tabla), cantidad)
+    valores = np.repeat(valores[:, :-1], len(umbrales), axis=1)
+
+    # Conteos y suma de la métrica por zona, y transiciones desde la zona base, con un bincount cada uno
+    escenario = np.arange(cantidad)
+    transiciones = np.bincount((base[:, None] * 3 + zonas + escenario * 9).ravel(),
+                               minlength=9 * cantidad).reshape(cantidad, 3, 3)
+    por_zona = transiciones.sum(axis=1)
+    suma_metrica = np.bincount((zonas + escenario * 3).ravel(), weights=valores.ravel(),
+                               minlength=3 * cantidad).reshape(cantidad, 3)
+    total_metrica = suma_metrica.sum(axis=1)
+
+    comparacion = pd.DataFrame({
+        'Métrica': [metrica for metrica, _ in escenarios],
+        'Corte A': [corte_a for _, (corte_a, _) in escenarios],
+        'Corte B': [corte_b for _, (_, corte_b) in escenarios],
+    })
+    for z, zona in enumerate(ZONAS):
+        comparacion[f'Materiales {zona}'] = por_zona[:, z]
+    for z, zona in enumerate(ZONAS):
+        comparacion[f'% Materiales {zona}'] = (por_zona[:, z] / max(len(tabla), 1) * 100).round(2)
+    for z, zona in enumerate(ZONAS):
+        porcentaje = np.divide(suma_metrica[:, z], total_metrica, out=np.zeros(cantidad), where=total_metrica > 0)
+        comparacion[f'% Métrica {zona}'] = (porcentaje * 100).round(2)
+    comparacion['Cambian de zona'] = len(tabla) - np.trace(transiciones, axis1=1, axis2=2)
+
+    migraciones = comparacion[['Métrica', 'Corte A', 'Corte B']].copy()
+    for desde, hacia in _MIGRACIONES:
+        migraciones[f'{desde}→{hacia}'] = transiciones[:, ZONAS.index(desde), ZONAS.index(hacia)]
+
+    columnas_zonas = {
+        _nombre_escenario(metrica, corte_a, corte_b): pd.Categorical.from_codes(zonas[:, i], ZONAS)
+        for i, (metrica, (corte_a, corte_b)) in enumerate(escenarios)
+    }
+    tabla_zonas = pd.concat([tabla[['Material']].reset_index(drop=True),
+                             pd.DataFrame(columnas_zonas)], axis=1)
+    return BarridoABC(tabla_zonas, comparacion, migraciones)
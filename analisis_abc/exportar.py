@@ -0,0 +1,79 @@
+"""Libro Excel descargable con la tabla principal, el resumen y el gráfico ABC.
+
+El libro se escribe en una sola pasada. Con xlsxwriter, si está instalado,
+se usa el modo constant_memory, que vuelca cada fila al disco en cuanto se
+escribe; si no, openpyxl, añadiendo la imagen antes de guardar en vez de
+guardar, recargar y volver a guardar el libro.
+"""
+
+import io
+import math
+
+import pandas as pd
+
+from analisis_abc.proceso import COLUMNAS_RESUMEN, anios_de_tabla, columnas_proceso
+
+HOJA_TABLA = 'Análisis ABC'
+HOJA_RESUMEN = 'Resumen ABC'
+CELDA_IMAGEN = 'A10'
+
+# El mismo estilo de encabezado que aplica pandas con to_excel
+_FORMATO_ENCABEZADO = {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+
+
+def _valores_por_columna(df):
+    """Listas de valores Python por columna, con None en lugar de NaN (celda vacía)."""
+    columnas = []
+    for _, serie in df.items():
+        valores = serie.tolist()
+        if serie.hasnans:
+            valores = [None if isinstance(v, float) and math.isnan(v) else v for v in valores]
+        columnas.append(valores)
+    return columnas
+
+
+def _escribir_hoja_xlsxwriter(ws, df, formato_encabezado):
+    ws.write_row(0, 0, df.columns.tolist(), formato_encabezado)
+    for fila, valores in enumerate(zip(*_valores_por_columna(df)), start=1):
+        ws.write_row(fila, 0, valores)
+
+
+def _libro_xlsxwriter(tabla, resumen, imagen_png):
+    import xlsxwriter
+
+    output = io.BytesIO()
+    wb = xlsxwriter.Workbook(output, {'constant_memory': True})
+    formato_encabezado = wb.add_format(_FORMATO_ENCABEZADO)
+
+    _escribir_hoja_xlsxwriter(wb.add_worksheet(HOJA_TABLA), tabla, formato_encabezado)
+    ws = wb.add_worksheet(HOJA_RESUMEN)
+    _escribir_hoja_xlsxwriter(ws, resumen, formato_encabezado)
+    ws.insert_image(CELDA_IMAGEN, 'abc.png', {'image_data': io.BytesIO(imagen_png)})
+
+    wb.close()
+    return output.getvalue()
+
+
+def _libro_openpyxl(tabla, resumen, imagen_png):
+    from openpyxl.drawing.image import Image as XLImage
+
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        tabla.to_excel(writer, sheet_name=HOJA_TABLA, index=False)
+        resumen.to_excel(writer, sheet_name=HOJA_RESUMEN, index=False)
+
+        xl_img = XLImage(io.BytesIO(imagen_png))
+        xl_img.anchor = CELDA_IMAGEN
+        writer.book[HOJA_RESUMEN].add_image(xl_img)
+    return output.getvalue()
+
+
+def libro_excel_abc(tabla, resumen, imagen_png):
+    """Hojas 'Análisis ABC' y 'Resumen ABC', con el gráfico anclado en A10 del resumen."""
+    tabla = tabla[columnas_proceso(anios_de_tabla(tabla))]
+    resumen = resumen[COLUMNAS_RESUMEN]
+    try:
+        import xlsxwriter  # noqa: F401
+    except ImportError:
+        return _libro_openpyxl(tabla, resumen, imagen_png)
+    return _libro_xlsxwriter(tabla, resumen, imagen_png)
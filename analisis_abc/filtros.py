@@ -0,0 +1,47 @@
+"""Jerarquía Quien Compra -> Tipo material -> Area Solicitantes de ZMM009.
+
+Se agrupa ZMM009 una sola vez por archivo y se guardan las posiciones de
+las filas de cada combinación. Las opciones de cada filtro y las filas
+seleccionadas se leen de esa jerarquía sin volver a recorrer la hoja.
+"""
+
+import numpy as np
+
+from analisis_abc.proceso import COLUMNAS_FILTRO
+
+
+class IndiceFiltros:
+    """Posiciones de las filas de ZMM009 por Quien Compra, Tipo material y Area Solicitantes.
+
+    Quien Compra y Tipo material mantienen el orden en que aparecen en la
+    hoja; las áreas se devuelven ordenadas.
+    """
+
+    def __init__(self, zm009):
+        grupos = zm009.groupby(COLUMNAS_FILTRO, observed=True, sort=False).indices
+        self._arbol = {}
+        for (quien_compra, tipo_material, area), posiciones in sorted(grupos.items(), key=lambda g: g[1][0]):
+            self._arbol.setdefault(quien_compra, {}).setdefault(tipo_material, {})[area] = posiciones
+
+    def quien_compra(self):
+        return list(self._arbol)
+
+    def tipos_material(self, quien_compra=None):
+        """Tipos de material de `quien_compra`, o de toda la hoja si es None."""
+        if quien_compra is not None:
+            return list(self._arbol.get(quien_compra, {}))
+        return list(dict.fromkeys(t for tipos in self._arbol.values() for t in tipos))
+
+    def areas(self, quien_compra=None, tipo_material=None):
+        """Áreas de la combinación indicada; con None no se filtra por ese nivel."""
+        niveles = self._arbol.values() if quien_compra is None else [self._arbol.get(quien_compra, {})]
+        areas = set()
+        for tipos in niveles:
+            for tipo, por_area in tipos.items():
+                if tipo_material is None or tipo == tipo_material:
+                    areas.update(por_area)
+        return sorted(areas)
+
+    def posiciones(self, quien_compra, tipo_material, area):
+        """Posiciones (ordenadas) de las filas de la combinación, vacío si no existe."""
+        return self._arbol.get(quien_compra, {}).get(tipo_material, {}).get(area, np.array([], dtype=np.intp))
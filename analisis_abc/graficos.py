@@ -0,0 +1,182 @@
+"""Gráfico del análisis ABC: barras de % Movimiento por zona y línea de % acumulado.
+
+Plotly y matplotlib se importan dentro de las funciones, la primera vez que
+se dibuja algo, para no cargarlos al importar el paquete. Los PNG se guardan
+en una caché por contenido del resumen y título: volver a exportar el mismo
+resultado no vuelve a dibujar el gráfico.
+"""
+
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+MAX_IMAGENES_EN_CACHE = 32
+
+_imagenes = OrderedDict()
+_candado_imagenes = threading.Lock()
+
+
+def figura_abc(resumen, titulo):
+    """Figura Plotly interactiva para la aplicación."""
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+
+    colores = {'A': 'green', 'B': 'gold', 'C': 'red'}
+    colores_mapeados = resumen['Zona'].map(colores)
+    fig.add_trace(
+        go.Bar(
+            x=resumen['Zona'],
+            y=resumen['% Movimiento'],
+            name='% Movimiento',
+            marker_color=colores_mapeados,
+            text=resumen['% Movimiento'].apply(lambda x: f'{x:.1f}%'),
+            textposition='auto'
+        ),
+        secondary_y=False
+    )
+
+    # Línea para % Movimiento Acumulado
+    fig.add_trace(
+        go.Scatter(
+            x=resumen['Zona'],
+            y=resumen['% de Movimiento acumulado'],
+            name='% Movimiento Acumulado',
+            mode='lines+markers+text',
+            line=dict(color='blue', width=3),
+            marker=dict(size=10),
+            text=resumen['% de Movimiento acumulado'].apply(lambda x: f'{x:.1f}%'),
+            textposition='top center'
+        ),
+        secondary_y=True
+    )
+
+    fig.update_layout(
+        title=titulo,
+        xaxis_title='Zona',
+        height=500,
+        showlegend=True,
+        legend=dict(x=0.7, y=1.15, orientation='h')
+    )
+
+    fig.update_yaxes(title_text="% Movimiento", secondary_y=False, range=[0, 120], dtick=10)
+    fig.update_yaxes(title_text="% Movimiento Acumulado", secondary_y=True, range=[0, 120], dtick=10)
+    return fig
+
+
+def _clave_imagen(resumen, titulo):
+    huella = hashlib.sha256(pd.util.hash_pandas_object(resumen, index=False).to_numpy().tobytes())
+    huella.update(repr(resumen.columns.tolist()).encode('utf-8'))
+    return huella.hexdigest(), titulo
+
+
+def imagen_abc_png(resumen, titulo):
+    """El mismo gráfico recreado con matplotlib, como PNG para incrustar en Excel.
+
+    Devuelve el PNG en caché si ya se dibujó uno con el mismo resumen y título.
+    """
+    clave = _clave_imagen(resumen, titulo)
+    with _candado_imagenes:
+        if clave in _imagenes:
+            _imagenes.move_to_end(clave)
+            return _imagenes[clave]
+
+    imagen_png = _dibujar_imagen_abc(resumen, titulo)
+    with _candado_imagenes:
+        _imagenes[clave] = imagen_png
+        while len(_imagenes) > MAX_IMAGENES_EN_CACHE:
+            _imagenes.popitem(last=False)
+    return imagen_png
+
+
+def vaciar_cache_imagenes():
+    with _candado_imagenes:
+        _imagenes.clear()
+
+
+def _dibujar_imagen_abc(resumen, titulo):
+    import matplotlib
+
+    matplotlib.use('Agg')
+
+    import matplotlib.patches as mpatches
+    import matplotlib.pyplot as plt
+    from matplotlib.lines import Line2D
+
+    fig_mpl, ax1 = plt.subplots(figsize=(12, 5), facecolor='white')
+    ax1.set_facecolor('white')
+
+    zonas = resumen['Zona'].tolist()
+    porcentajes = resumen['% Movimiento'].tolist()
+    acumulados = resumen['% de Movimiento acumulado'].tolist()
+
+    colores = ['green' if z == 'A' else 'gold' if z == 'B' else 'red' for z in zonas]
+
+    x = np.arange(len(zonas))
+
+    # Barras más anchas (igual que Plotly)
+    bars = ax1.bar(x, porcentajes, color=colores, width=0.6, label='% Movimiento')
+
+    # Etiquetas DENTRO de las barras, centradas verticalmente (igual que Plotly)
+    for bar, val in zip(bars, porcentajes):
+        bar_height = bar.get_height()
+        # Solo pone texto dentro si la barra es suficientemente alta
+        if bar_height > 8:
+            ax1.text(bar.get_x() + bar.get_width() / 2, bar_height / 2,
+                     f'{val:.1f}%', ha='center', va='center',
+                     fontsize=10, color='white', fontweight='bold')
+        else:
+            ax1.text(bar.get_x() + bar.get_width() / 2, bar_height + 1,
+                     f'{val:.1f}%', ha='center', va='bottom',
+                     fontsize=10, color='black')
+
+    # Grid gris claro (igual que Plotly)
+    ax1.yaxis.grid(True, color='lightgrey', linestyle='-', linewidth=0.7)
+    ax1.set_axisbelow(True)
+    ax1.spines['top'].set_visible(False)
+    ax1.spines['right'].set_visible(False)
+
+    ax1.set_ylim(0, 120)
+    ax1.set_yticks(range(0, 121, 10))
+    ax1.set_ylabel('% Movimiento')
+    ax1.set_xticks(x)
+    ax1.set_xticklabels(zonas)
+    ax1.set_xlabel('Zona')
+    ax1.set_title(titulo, fontsize=13, loc='left', fontweight='bold')
+
+    # Eje Y derecho
+    ax2 = ax1.twinx()
+    ax2.plot(x, acumulados, color='blue', linewidth=3,
+             marker='o', markersize=8, label='% Movimiento Acumulado', zorder=5)
+
+    # Etiquetas línea ARRIBA de cada punto (igual que Plotly textposition='top center')
+    for i, val in enumerate(acumulados):
+        ax2.text(i, val + 3, f'{val:.1f}%', ha='center', va='bottom',
+                 fontsize=10, color='blue')
+
+    ax2.set_ylim(0, 120)
+    ax2.set_yticks(range(0, 121, 10))
+    ax2.set_ylabel('% Movimiento Acumulado')
+    ax2.spines['top'].set_visible(False)
+
+    # Leyenda horizontal FUERA del gráfico, arriba a la derecha (igual que Plotly)
+    patch_bar = mpatches.Patch(color='green', label='% Movimiento')
+    line_acum = Line2D([0], [0], color='blue', linewidth=2,
+                       marker='o', markersize=7, label='% Movimiento Acumulado')
+    ax1.legend(handles=[patch_bar, line_acum],
+               loc='upper left',
+               bbox_to_anchor=(0.65, 1.12),
+               ncol=2, fontsize=9, frameon=True)
+
+    plt.tight_layout()
+
+    # Guardar figura en buffer
+    img_stream = io.BytesIO()
+    fig_mpl.savefig(img_stream, format='png', dpi=150, bbox_inches='tight')
+    plt.close(fig_mpl)
+    return img_stream.getvalue()
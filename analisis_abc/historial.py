@@ -0,0 +1,283 @@
+"""Historial persistente de movimientos MB51 en Parquet.
+
+Los movimientos se guardan en una carpeta local, un archivo por carga y
+por ejercicio:
+
+    <carpeta>/movimientos/ejercicio=2024/<id de carga>.parquet
+    <carpeta>/indice.parquet
+
+Al agregar una hoja MB51 solo se guardan los movimientos cuyo (ejercicio,
+documento, posición) no estaba ya, comparando con los archivos de los
+ejercicios afectados. El índice agregado que usan las columnas de
+movimientos (ver analisis_abc.movimientos) se actualiza sumándole el índice
+de los movimientos nuevos, sin recalcularlo desde cero.
+
+Cada carga se escribe primero en archivos temporales y solo se renombra a
+su sitio cuando todo se ha escrito. El índice guarda en sus metadatos qué
+cargas incluye: si un fallo deja archivos de una carga sin su parte del
+índice, se suman al índice antes de leerlo o de agregar otra carga.
+
+Las lecturas y escrituras se serializan con un candado por carpeta entre
+los hilos del proceso y con un bloqueo del archivo <carpeta>/.lock entre
+procesos, así la aplicación y la tarea nocturna de la línea de comandos
+pueden usar la misma carpeta.
+"""
+
+import json
+import numbers
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from analisis_abc.ingesta import TIPOS_COLUMNAS
+from analisis_abc.movimientos import CLAVES_INDICE, construir_indice_movimientos
+
+COLUMNA_EJERCICIO = 'Ejerc.documento mat.'
+CLAVES_MOVIMIENTO = [COLUMNA_EJERCICIO, 'Doc.mat.', 'Pos.']
+
+_SIN_EJERCICIO = 'sin_ejercicio'
+_METADATO_CARGAS = b'analisis_abc.cargas'
+# Columna auxiliar que marca qué valores de una columna mixta eran números
+_SUFIJO_NUMERICO = ' (numérico)'
+
+# Un candado por carpeta, compartido por todas las sesiones del proceso
+_candados = {}
+_candado_candados = threading.Lock()
+
+
+def _candado(carpeta):
+    with _candado_candados:
+        return _candados.setdefault(carpeta, threading.Lock())
+
+
+try:
+    import fcntl
+except ImportError:
+    import msvcrt
+
+    def _bloquear_archivo(archivo):
+        archivo.seek(0)
+        while True:
+            try:
+                msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                # LK_LOCK se rinde tras unos 10 s de espera; se sigue esperando
+                continue
+
+    def _liberar_archivo(archivo):
+        archivo.seek(0)
+        msvcrt.locking(archivo.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    def _bloquear_archivo(archivo):
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_EX)
+
+    def _liberar_archivo(archivo):
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def _bloqueo(carpeta):
+    """Acceso exclusivo a la carpeta del historial, entre hilos y entre procesos."""
+    with _candado(carpeta):
+        carpeta.mkdir(parents=True, exist_ok=True)
+        with open(carpeta / '.lock', 'a+b') as archivo:
+            _bloquear_archivo(archivo)
+            try:
+                yield
+            finally:
+                _liberar_archivo(archivo)
+
+
+def _nombre_particion(ejercicio):
+    return f"ejercicio={_SIN_EJERCICIO if pd.isna(ejercicio) else int(ejercicio)}"
+
+
+def _para_parquet(df):
+    """`df` con columnas que pyarrow puede escribir.
+
+    Las categorías de cada carga tienen valores distintos; se guardan como
+    texto. Las columnas que mezclan números y textos (Material con códigos
+    numéricos y alfanuméricos, tal como lo lee pandas de Excel) se guardan
+    como texto, con una columna '<columna> (numérico)' que marca qué valores
+    eran números para recuperarlos en _de_parquet.
+    """
+    columnas = df.select_dtypes('category').columns
+    if len(columnas):
+        df = df.astype({c: object for c in columnas})
+    mixtas = {}
+    for columna in df.columns[df.dtypes == object]:
+        valores = df[columna]
+        if pd.api.types.infer_dtype(valores, skipna=True) in ('mixed', 'mixed-integer'):
+            mixtas[columna] = valores.map(str, na_action='ignore')
+            mixtas[columna + _SUFIJO_NUMERICO] = valores.map(
+                lambda v: isinstance(v, numbers.Number), na_action='ignore').fillna(False).astype(bool)
+    return df.assign(**mixtas) if mixtas else df
+
+
+def _numero(texto):
+    try:
+        return int(texto)
+    except ValueError:
+        return float(texto)
+
+
+def _de_parquet(df):
+    """Deshace la conversión de las columnas mixtas de _para_parquet."""
+    for marca in [c for c in df.columns if c.endswith(_SUFIJO_NUMERICO)]:
+        columna = marca[:-len(_SUFIJO_NUMERICO)]
+        valores = df[columna].astype(object)
+        es_numero = df[marca].to_numpy(dtype=bool)
+        valores[es_numero] = [_numero(v) for v in valores[es_numero]]
+        df = df.drop(columns=marca).assign(**{columna: valores})
+    return df
+
+
+def _leer_parquet(ruta, columnas=None):
+    if columnas is not None:
+        guardadas = pq.read_schema(ruta).names
+        columnas = [c for c in guardadas
+                    if c in columnas or (c.endswith(_SUFIJO_NUMERICO) and c[:-len(_SUFIJO_NUMERICO)] in columnas)]
+    return _de_parquet(pd.read_parquet(ruta, columns=columnas))
+
+
+def _sumar_indices(*indices):
+    indice = pd.concat(indices, ignore_index=True)
+    return (
+        indice.groupby(CLAVES_INDICE, dropna=False, observed=True, sort=False)[['Registros', 'Cantidad']]
+        .sum()
+        .reset_index()
+    )
+
+
+class HistorialMovimientos:
+    """Movimientos MB51 acumulados entre cargas, con su índice agregado."""
+
+    def __init__(self, carpeta):
+        self.carpeta = Path(carpeta).resolve()
+        self.carpeta_movimientos = self.carpeta / 'movimientos'
+        self.ruta_indice = self.carpeta / 'indice.parquet'
+
+    def _archivos(self, particion=None):
+        patron = f'{particion}/*.parquet' if particion else '*/*.parquet'
+        return sorted(self.carpeta_movimientos.glob(patron))
+
+    def _leer_indice(self):
+        """(índice guardado, cargas que incluye), o (None, vacío) si aún no hay índice.
+
+        Un índice sin la lista de cargas (escrito antes de guardarla) se da
+        por completo.
+        """
+        if not self.ruta_indice.exists():
+            return None, set()
+        tabla = pq.read_table(self.ruta_indice)
+        cargas = (tabla.schema.metadata or {}).get(_METADATO_CARGAS)
+        cargas = set(json.loads(cargas)) if cargas is not None else {a.stem for a in self._archivos()}
+        return _de_parquet(tabla.to_pandas()), cargas
+
+    def _escribir_indice(self, indice, cargas):
+        tabla = pa.Table.from_pandas(_para_parquet(indice), preserve_index=False)
+        metadatos = {**(tabla.schema.metadata or {}), _METADATO_CARGAS: json.dumps(sorted(cargas)).encode()}
+        temporal = self.ruta_indice.with_suffix('.tmp')
+        pq.write_table(tabla.replace_schema_metadata(metadatos), temporal)
+        temporal.replace(self.ruta_indice)
+
+    def _completar_indice(self):
+        """Suma al índice las cargas guardadas que no incluye y lo devuelve con sus cargas."""
+        indice, cargas = self._leer_indice()
+        pendientes = [a for a in self._archivos() if a.stem not in cargas]
+        if pendientes:
+            faltante = construir_indice_movimientos(pd.concat([_leer_parquet(a) for a in pendientes],
+                                                              ignore_index=True))
+            indice = faltante if indice is None else _sumar_indices(indice, faltante)
+            cargas |= {a.stem for a in pendientes}
+            self._escribir_indice(indice, cargas)
+        return indice, cargas
+
+    def _claves_guardadas(self, particion):
+        archivos = self._archivos(particion)
+        if not archivos:
+            return pd.DataFrame(columns=CLAVES_MOVIMIENTO)
+        return pd.concat([_leer_parquet(a, CLAVES_MOVIMIENTO) for a in archivos], ignore_index=True)
+
+    def _nuevos(self, mb51):
+        """Filas de `mb51` que no están en el historial ni repetidas en la propia hoja."""
+        mb51 = mb51.drop_duplicates(CLAVES_MOVIMIENTO)
+        partes = []
+        for ejercicio, grupo in mb51.groupby(COLUMNA_EJERCICIO, dropna=False, sort=False):
+            guardadas = self._claves_guardadas(_nombre_particion(ejercicio))
+            if len(guardadas):
+                cruce = grupo[CLAVES_MOVIMIENTO].merge(guardadas, how='left', indicator=True)
+                grupo = grupo[(cruce['_merge'] == 'left_only').to_numpy()]
+            partes.append(grupo)
+        return pd.concat(partes) if partes else mb51.iloc[:0]
+
+    def agregar(self, mb51):
+        """Guarda los movimientos nuevos de `mb51`, actualiza el índice y
+        devuelve cuántos movimientos se agregaron."""
+        faltantes = [c for c in CLAVES_MOVIMIENTO if c not in mb51.columns]
+        if faltantes:
+            raise ValueError(f"Para usar el historial, MB51 necesita las columnas: {', '.join(faltantes)}")
+
+        with _bloqueo(self.carpeta):
+            indice, cargas = self._completar_indice()
+            nuevos = self._nuevos(mb51)
+            if len(nuevos) == 0:
+                return 0
+
+            # Todo se escribe en temporales ('.parquet.tmp' no lo lee _archivos) antes de renombrar
+            carga = uuid.uuid4().hex
+            temporales = []
+            try:
+                for ejercicio, grupo in nuevos.groupby(COLUMNA_EJERCICIO, dropna=False, sort=False):
+                    carpeta = self.carpeta_movimientos / _nombre_particion(ejercicio)
+                    carpeta.mkdir(parents=True, exist_ok=True)
+                    temporales.append(carpeta / f'{carga}.parquet.tmp')
+                    _para_parquet(grupo).to_parquet(temporales[-1], index=False)
+
+                indice_nuevos = construir_indice_movimientos(nuevos)
+                indice = indice_nuevos if indice is None else _sumar_indices(indice, indice_nuevos)
+            except BaseException:
+                for temporal in temporales:
+                    temporal.unlink(missing_ok=True)
+                raise
+
+            for temporal in temporales:
+                temporal.replace(temporal.with_suffix(''))
+            self._escribir_indice(indice, cargas | {carga})
+            return len(nuevos)
+
+    def version(self):
+        """Identificador del estado guardado: cambia con cada carga que modifica
+        el índice. None si aún no hay índice."""
+        try:
+            estado = self.ruta_indice.stat()
+        except FileNotFoundError:
+            return None
+        return estado.st_mtime_ns, estado.st_size
+
+    def indice(self):
+        """Índice agregado de todos los movimientos guardados, como el de
+        construir_indice_movimientos."""
+        with _bloqueo(self.carpeta):
+            indice, _ = self._completar_indice()
+        if indice is None:
+            return construir_indice_movimientos(pd.DataFrame(columns=CLAVES_INDICE + ['Cantidad']))
+        return indice.astype({c: t for c, t in TIPOS_COLUMNAS['MB51'].items() if c in indice.columns})
+
+    def movimientos(self, ejercicios=None):
+        """Todos los movimientos guardados, o solo los de los ejercicios indicados."""
+        with _bloqueo(self.carpeta):
+            if ejercicios is None:
+                archivos = self._archivos()
+            else:
+                archivos = [a for e in ejercicios for a in self._archivos(_nombre_particion(e))]
+            partes = [_leer_parquet(a) for a in archivos]
+        if not partes:
+            return pd.DataFrame(columns=CLAVES_INDICE + ['Cantidad'] + CLAVES_MOVIMIENTO[1:])
+        return pd.concat(partes, ignore_index=True).astype(TIPOS_COLUMNAS['MB51'])
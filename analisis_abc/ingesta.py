@@ -0,0 +1,236 @@
+"""Lectura del libro Excel de SAP (hojas ZMM009, MB51 y SC).
+
+El libro se abre una sola vez y de cada hoja se leen solo las columnas que
+usa el análisis, con tipos explícitos. El lector es intercambiable:
+
+- 'calamine': lector nativo de python-calamine, el más rápido, si está instalado.
+- 'openpyxl-stream': openpyxl en modo read_only, volcando las filas
+  directamente en arrays por columna, sin la conversión celda a celda de pandas.
+- 'openpyxl': pd.read_excel con openpyxl, el comportamiento original.
+
+Después las hojas se compactan (ver compactar_libro): Material pasa a ser
+una categoría compartida por las tres hojas, los textos repetidos a
+categorías y los enteros al tipo más pequeño que los contiene.
+
+La huella del contenido permite a la aplicación guardar el resultado en
+caché y no volver a leer el mismo archivo.
+"""
+
+import hashlib
+import io
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+HOJAS = ('ZMM009', 'MB51', 'SC')
+
+COLUMNAS_USADAS = {
+    'ZMM009': [
+        'Material', 'Nºmaterial ant.', 'Denominación', 'Quien Compra', 'Area Solicitantes',
+        'Stock Máximo', 'Stock Mínimo', 'Tipo material', 'Stock Total', 'Stock Real',
+        'UM base', 'Almacén',
+    ],
+    'MB51': ['Material', 'Tipo material', 'Indicador Debe/Haber', 'Ejerc.documento mat.', 'Cantidad'],
+    'SC': ['Cod. SAP', 'Solicitud \nPedido'],
+}
+
+# Columnas que se leen si están en la hoja, pero que no son obligatorias.
+# El documento y la posición de MB51 identifican cada movimiento en el historial.
+COLUMNAS_OPCIONALES = {
+    'ZMM009': [],
+    'MB51': ['Doc.mat.', 'Pos.'],
+    'SC': [],
+}
+
+TIPOS_COLUMNAS = {
+    'ZMM009': {'Almacén': 'category', 'Tipo material': 'category'},
+    'MB51': {'Tipo material': 'category', 'Indicador Debe/Haber': 'category'},
+    'SC': {},
+}
+
+MOTORES = ('calamine', 'openpyxl-stream', 'openpyxl')
+
+# Textos con pocos valores distintos que se guardan como categorías al compactar
+COLUMNAS_CATEGORIA = {
+    'ZMM009': ['Quien Compra', 'Area Solicitantes', 'UM base'],
+    'MB51': [],
+    'SC': [],
+}
+
+# Columnas con el código de material en cada hoja; comparten las mismas categorías
+COLUMNAS_MATERIAL = {'ZMM009': 'Material', 'MB51': 'Material', 'SC': 'Cod. SAP'}
+
+
+class LibroSAP(NamedTuple):
+    zm009: pd.DataFrame
+    mb51: pd.DataFrame
+    sc: pd.DataFrame
+
+
+def huella_contenido(datos):
+    """Huella SHA-256 de los bytes del archivo subido."""
+    return hashlib.sha256(datos).hexdigest()
+
+
+def motor_por_defecto():
+    """'calamine' si python-calamine está instalado, si no 'openpyxl-stream'."""
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return 'openpyxl-stream'
+    return 'calamine'
+
+
+def _abrir_libro(datos, motor):
+    if motor == 'openpyxl-stream':
+        from openpyxl import load_workbook
+        return load_workbook(io.BytesIO(datos), read_only=True, data_only=True, keep_links=False)
+    if motor in ('calamine', 'openpyxl'):
+        return pd.ExcelFile(io.BytesIO(datos), engine=motor)
+    raise ValueError(f"Motor de lectura desconocido: {motor!r}. Opciones: {', '.join(MOTORES)}")
+
+
+def _leer_filas_openpyxl(libro, hoja, columnas):
+    filas = libro[hoja].iter_rows(values_only=True)
+    encabezado = next(filas, ())
+    posiciones = {}
+    for i, nombre in enumerate(encabezado):
+        if nombre in columnas and nombre not in posiciones:
+            posiciones[nombre] = i
+    if not posiciones:
+        return pd.DataFrame()
+
+    ancho = len(encabezado)
+    seleccion = itemgetter(*posiciones.values())
+    valores = [
+        seleccion(fila if len(fila) >= ancho else fila + (None,) * (ancho - len(fila)))
+        for fila in filas
+    ]
+    if len(posiciones) == 1:
+        valores = [(v,) for v in valores]
+
+    # Como read_excel, se descartan las filas vacías del final de la hoja
+    while valores and all(v is None for v in valores[-1]):
+        valores.pop()
+    df = pd.DataFrame.from_records(valores, columns=list(posiciones))
+
+    # Y como read_excel, las columnas de texto con solo números se convierten a número
+    for columna in df.select_dtypes(include=['object', 'string']).columns:
+        try:
+            df[columna] = pd.to_numeric(df[columna])
+        except (ValueError, TypeError):
+            pass
+    return df
+
+
+def leer_hoja(libro, hoja, motor):
+    """Lee una hoja del libro abierto con sus columnas usadas y tipos explícitos."""
+    columnas = COLUMNAS_USADAS[hoja]
+    a_leer = columnas + COLUMNAS_OPCIONALES[hoja]
+    if motor == 'openpyxl-stream':
+        df = _leer_filas_openpyxl(libro, hoja, a_leer)
+    else:
+        df = pd.read_excel(libro, sheet_name=hoja, usecols=lambda c: c in a_leer)
+
+    faltantes = [c for c in columnas if c not in df.columns]
+    if faltantes:
+        raise ValueError(f"La hoja {hoja} no tiene las columnas: {', '.join(faltantes)}")
+
+    return df[[c for c in a_leer if c in df.columns]].astype(TIPOS_COLUMNAS[hoja])
+
+
+def _leer_hoja_aislada(datos, hoja, motor):
+    libro = _abrir_libro(datos, motor)
+    try:
+        return leer_hoja(libro, hoja, motor)
+    finally:
+        libro.close()
+
+
+_INT32 = np.iinfo(np.int32)
+
+
+def _compactar_hoja(df, hoja, tipo_material):
+    tipos = {c: 'category' for c in COLUMNAS_CATEGORIA[hoja] if c in df.columns}
+    tipos[COLUMNAS_MATERIAL[hoja]] = tipo_material
+    # Los enteros que caben pasan a int32; no menos, para que restas como
+    # Stock Máximo - Stock Mínimo no desborden. Los decimales quedan en
+    # float64 para que las sumas no pierdan precisión.
+    for columna in df.columns[[pd.api.types.is_integer_dtype(t) for t in df.dtypes]]:
+        if columna in tipos:
+            continue
+        valores = df[columna]
+        if len(valores) and valores.min() >= _INT32.min and valores.max() <= _INT32.max:
+            tipos[columna] = 'int32'
+    return df.astype(tipos)
+
+
+def compactar_libro(libro):
+    """Devuelve el libro con tipos más pequeños y los mismos valores."""
+    codigos = pd.concat([hoja[COLUMNAS_MATERIAL[nombre]] for nombre, hoja in zip(HOJAS, libro)], ignore_index=True)
+    tipo_material = pd.CategoricalDtype(pd.Index(codigos.dropna().unique()))
+    return LibroSAP(*(_compactar_hoja(hoja, nombre, tipo_material) for nombre, hoja in zip(HOJAS, libro)))
+
+
+def _memoria_mb(df, sin_categorias=None):
+    """Memoria de `df` en MB; de la columna `sin_categorias` solo cuenta los códigos."""
+    memoria = df.memory_usage(deep=True, index=False)
+    if sin_categorias is not None and isinstance(df[sin_categorias].dtype, pd.CategoricalDtype):
+        memoria[sin_categorias] = df[sin_categorias].cat.codes.nbytes
+    return memoria.sum() / 2**20
+
+
+def _fila_informe(nombre, filas, mb_antes, mb_despues):
+    return {
+        'Hoja': nombre,
+        'Filas': filas,
+        'MB antes': round(mb_antes, 2),
+        'MB después': round(mb_despues, 2),
+        '% ahorro': round((1 - mb_despues / mb_antes) * 100, 1) if mb_antes else 0.0,
+    }
+
+
+def informe_memoria(original, compacto):
+    """Memoria de cada hoja antes y después de compactar, en MB.
+
+    Las categorías de Material se guardan una sola vez para las tres hojas y
+    se cuentan aparte, en la fila 'Material (categorías)'.
+    """
+    filas = [
+        _fila_informe(nombre, len(antes), _memoria_mb(antes), _memoria_mb(despues, COLUMNAS_MATERIAL[nombre]))
+        for nombre, antes, despues in zip(HOJAS, original, compacto)
+    ]
+    materiales = compacto.zm009[COLUMNAS_MATERIAL['ZMM009']]
+    if isinstance(materiales.dtype, pd.CategoricalDtype):
+        categorias = materiales.cat.categories
+        filas.append(_fila_informe('Material (categorías)', len(categorias), 0,
+                                   categorias.memory_usage(deep=True) / 2**20))
+    total = pd.DataFrame(filas)
+    filas.append(_fila_informe('Total', total['Filas'].iloc[:len(HOJAS)].sum(),
+                               total['MB antes'].sum(), total['MB después'].sum()))
+    return pd.DataFrame(filas)
+
+
+def leer_libro_sap(datos, motor=None, procesos=1, compactar=True):
+    """Lee las tres hojas del libro a partir de sus bytes.
+
+    Con `compactar` se aplica compactar_libro al resultado. Con `procesos` > 1
+    cada hoja se lee en un proceso aparte, cada uno con su propia copia del
+    libro. Solo compensa con lectores en Python puro y hojas de tamaño
+    parecido: el tiempo total no baja de lo que tarda la hoja más grande
+    (normalmente MB51).
+    """
+    motor = motor or motor_por_defecto()
+    if procesos > 1:
+        with ProcessPoolExecutor(max_workers=min(procesos, len(HOJAS))) as executor:
+            libro = LibroSAP(*executor.map(_leer_hoja_aislada, [datos] * len(HOJAS), HOJAS, [motor] * len(HOJAS)))
+    else:
+        archivo = _abrir_libro(datos, motor)
+        try:
+            libro = LibroSAP(*(leer_hoja(archivo, hoja, motor) for hoja in HOJAS))
+        finally:
+            archivo.close()
+    return compactar_libro(libro) if compactar else libro
@@ -0,0 +1,135 @@
+"""Análisis ABC en lote para todas las combinaciones de filtros.
+
+Las columnas que no dependen de la combinación (stock, cantidad a comprar,
+solicitudes y movimientos) se calculan una sola vez para todas las filas
+seleccionadas de ZMM009. Después cada combinación solo ordena y clasifica
+su parte, y ese ranking puede repartirse en un pool de procesos.
+"""
+
+import io
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from analisis_abc.proceso import (
+    COLUMNAS_FILTRO,
+    COLUMNAS_RESUMEN,
+    CONTEOS_FILTRO,
+    ResultadoABC,
+    agregar_movimientos,
+    anios_de_tabla,
+    calcular_cantidad_a_comprar,
+    clasificar_abc,
+    columnas_proceso,
+    quitar_con_solicitud,
+    resumen_abc,
+)
+
+
+def combinaciones_disponibles(zm009, quien_compra=None, tipos_material=None, areas=None):
+    """Combinaciones (Quien Compra, Tipo material, Area Solicitantes) presentes
+    en ZMM009, opcionalmente limitadas a los valores indicados."""
+    combinaciones = zm009[COLUMNAS_FILTRO].dropna().drop_duplicates()
+    for columna, valores in zip(COLUMNAS_FILTRO, (quien_compra, tipos_material, areas)):
+        if valores is not None:
+            combinaciones = combinaciones[combinaciones[columna].isin(valores)]
+    return sorted(combinaciones.itertuples(index=False, name=None), key=lambda c: tuple(map(str, c)))
+
+
+def _clasificar_grupo(df):
+    df = clasificar_abc(df.reset_index(drop=True))
+    return df, resumen_abc(df)
+
+
+def _agrupar(df, combinaciones):
+    grupos = {clave: grupo for clave, grupo in df.groupby(COLUMNAS_FILTRO, observed=True, sort=False)}
+    return [grupos.get(combinacion) for combinacion in combinaciones]
+
+
+def procesar_lote(zm009, agregados, combinaciones, anios=None, procesos=1):
+    """Ejecuta el pipeline para cada combinación y devuelve {combinación: ResultadoABC}.
+
+    El resultado de cada combinación es el mismo que daría `procesar_area`.
+    Con `procesos` > 1 la clasificación ABC de cada grupo se reparte en un
+    pool de procesos.
+    """
+    combinaciones = list(combinaciones)
+    claves = pd.MultiIndex.from_frame(zm009[COLUMNAS_FILTRO].astype(object))
+    seleccion = zm009[claves.isin(combinaciones)].reset_index(drop=True)
+
+    # Como en procesar_area, los filtros posteriores al que vació la combinación cuentan 0
+    conteos = {c: dict.fromkeys(CONTEOS_FILTRO, 0) for c in combinaciones}
+    for combinacion, grupo in zip(combinaciones, _agrupar(seleccion, combinaciones)):
+        if grupo is not None:
+            conteos[combinacion]['Filtros iniciales'] = len(grupo)
+
+    df = calcular_cantidad_a_comprar(seleccion, agregados.tabla_stock)
+    for combinacion, grupo in zip(combinaciones, _agrupar(df, combinaciones)):
+        if grupo is not None:
+            conteos[combinacion]['Cant a Comp. numérica'] = len(grupo)
+
+    df = quitar_con_solicitud(df, agregados.indice_solicitudes)
+    for combinacion, grupo in zip(combinaciones, _agrupar(df, combinaciones)):
+        if grupo is not None:
+            conteos[combinacion]['Sin solicitud de pedido'] = len(grupo)
+
+    df = agregar_movimientos(df, agregados.indice_movimientos, anios)
+    con_datos = [(c, g) for c, g in zip(combinaciones, _agrupar(df, combinaciones)) if g is not None]
+
+    if procesos > 1 and len(con_datos) > 1:
+        with ProcessPoolExecutor(max_workers=procesos) as executor:
+            clasificados = list(executor.map(_clasificar_grupo, [g for _, g in con_datos],
+                                             chunksize=max(len(con_datos) // (procesos * 4), 1)))
+    else:
+        clasificados = [_clasificar_grupo(g) for _, g in con_datos]
+
+    vacia = df.iloc[0:0].reset_index(drop=True)
+    resultados = {c: ResultadoABC(vacia, None, conteos[c]) for c in combinaciones}
+    for (combinacion, _), (tabla, resumen) in zip(con_datos, clasificados):
+        resultados[combinacion] = ResultadoABC(tabla, resumen, conteos[combinacion])
+    return resultados
+
+
+def tabla_resumen_lote(resultados):
+    """Una fila por combinación con los conteos de cada filtro y los materiales por zona."""
+    filas = []
+    for (quien_compra, tipo_material, area), resultado in resultados.items():
+        fila = {'Quien Compra': quien_compra, 'Tipo material': tipo_material, 'Area Solicitantes': area}
+        fila.update(resultado.conteos)
+        zonas = resultado.tabla['Zona'].value_counts() if resultado.resumen is not None else {}
+        for zona in ['A', 'B', 'C']:
+            fila[f'Zona {zona}'] = int(zonas.get(zona, 0))
+        filas.append(fila)
+    return pd.DataFrame(filas)
+
+
+# Excel limita los nombres de hoja a 31 caracteres y no admite []:*?/\
+_CARACTERES_NO_VALIDOS_HOJA = re.compile(r'[\[\]:*?/\\]')
+
+
+def _nombre_hoja(numero, area):
+    return f"{numero:03d} {_CARACTERES_NO_VALIDOS_HOJA.sub(' ', str(area))}"[:31]
+
+
+def libro_lote_excel(resultados):
+    """Libro con una hoja índice 'Lote' y, por cada combinación con resultado,
+    una hoja con su tabla principal y su cuadro resumen a la derecha."""
+    indice = tabla_resumen_lote(resultados)
+    hojas = []
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        for numero, resultado in enumerate(resultados.values(), start=1):
+            if resultado.resumen is None:
+                hojas.append("")
+                continue
+            hoja = _nombre_hoja(numero, resultado.tabla['Area Solicitantes'].iloc[0])
+            hojas.append(hoja)
+            columnas = columnas_proceso(anios_de_tabla(resultado.tabla))
+            resultado.tabla[columnas].to_excel(writer, sheet_name=hoja, index=False)
+            resultado.resumen[COLUMNAS_RESUMEN].to_excel(writer, sheet_name=hoja, index=False,
+                                                         startcol=len(columnas) + 1)
+        indice.insert(0, 'Hoja', hojas)
+        indice.to_excel(writer, sheet_name='Lote', index=False)
+        writer.book.move_sheet('Lote', offset=-(len(writer.book.sheetnames) - 1))
+    return output.getvalue()
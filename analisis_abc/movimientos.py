@@ -0,0 +1,119 @@
+"""Índice de movimientos MB51 agregado por material.
+
+En lugar de recorrer toda la hoja MB51 una vez por material y por columna,
+se agrupa una sola vez por (Material, Tipo material, Indicador Debe/Haber,
+Ejerc.documento mat.) y todas las columnas de movimientos se leen de ese
+resultado.
+"""
+
+import pandas as pd
+
+from analisis_abc.diagnostico import medir_etapa
+
+CLAVES_INDICE = ['Material', 'Tipo material', 'Indicador Debe/Haber', 'Ejerc.documento mat.']
+
+INGRESO = 'S'
+SALIDA = 'H'
+
+
+def construir_indice_movimientos(mb51):
+    """Agrupa MB51 y devuelve, por cada combinación de claves, el número de
+    registros ('Registros') y la suma de 'Cantidad'.
+
+    Se conservan los grupos con indicador, tipo o ejercicio vacíos porque
+    cuentan para 'Ingreso y Salida' y para los totales sin año.
+    """
+    mb51 = mb51[mb51['Material'].notna()]
+    cantidad = mb51['Cantidad']
+    if pd.api.types.is_integer_dtype(cantidad):
+        # La hoja compactada guarda int32; la suma se hace en int64 para que no desborde
+        cantidad = cantidad.astype('int64')
+    return (
+        cantidad.groupby([mb51[c] for c in CLAVES_INDICE], dropna=False, observed=True, sort=False)
+        .agg(Registros='size', Cantidad='sum')
+        .reset_index()
+    )
+
+
+def anios_movimiento(indice, desde=None, hasta=None):
+    """Ejercicios con cantidades de ingreso o salida en el índice, ordenados
+    y opcionalmente limitados a [desde, hasta]."""
+    con_cantidad = indice['Tipo material'].notna() & indice['Indicador Debe/Haber'].isin([INGRESO, SALIDA])
+    anios = sorted(int(a) for a in indice.loc[con_cantidad, 'Ejerc.documento mat.'].dropna().unique())
+    return [a for a in anios if (desde is None or a >= desde) and (hasta is None or a <= hasta)]
+
+
+def _conteos_por_material(indice):
+    registros = indice.groupby('Material', observed=True, sort=False)['Registros']
+    es_ingreso = indice['Indicador Debe/Haber'] == INGRESO
+    es_salida = indice['Indicador Debe/Haber'] == SALIDA
+
+    # Sin ordenar la unión de materiales: con códigos numéricos y alfanuméricos no se pueden comparar
+    conteos = pd.concat({
+        'Cant. Ingreso': indice[es_ingreso].groupby('Material', observed=True, sort=False)['Registros'].sum(),
+        'Cant Salida': indice[es_salida].groupby('Material', observed=True, sort=False)['Registros'].sum(),
+        'Ingreso y Salida': registros.sum(),
+    }, axis=1, sort=False)
+    return conteos.fillna(0).astype('int64')
+
+
+def _cantidades_por_material_tipo(indice, anios):
+    con_tipo = indice[
+        indice['Tipo material'].notna() &
+        indice['Indicador Debe/Haber'].isin([INGRESO, SALIDA])
+    ]
+    claves = ['Material', 'Tipo material']
+
+    totales = (
+        con_tipo.groupby(claves + ['Indicador Debe/Haber'], observed=True)['Cantidad']
+        .sum()
+        .unstack('Indicador Debe/Haber')
+    )
+    por_anio = (
+        con_tipo.groupby(claves + ['Indicador Debe/Haber', 'Ejerc.documento mat.'], observed=True)['Cantidad']
+        .sum()
+        .unstack(['Indicador Debe/Haber', 'Ejerc.documento mat.'])
+    )
+
+    por_anio = por_anio.reindex(columns=pd.MultiIndex.from_product([[INGRESO, SALIDA], anios]))
+    totales = totales.reindex(columns=[INGRESO, SALIDA])
+
+    cantidades = pd.DataFrame(index=totales.index)
+    for anio in anios:
+        cantidades[f'Ingreso {anio}'] = por_anio[(INGRESO, anio)]
+        cantidades[f'Salida {anio}'] = por_anio[(SALIDA, anio)]
+    cantidades['Cant. Ingreso. (501/561)'] = totales[INGRESO]
+    cantidades['Cant. Salida.'] = totales[SALIDA]
+
+    cantidades = cantidades.fillna(0)
+    if pd.api.types.is_integer_dtype(indice['Cantidad']):
+        cantidades = cantidades.astype(indice['Cantidad'].dtype)
+    return cantidades
+
+
+def agregar_columnas_movimiento(df, indice, anios, diagnostico=None):
+    """Añade a `df` las columnas de movimientos leídas del índice MB51.
+
+    Los conteos ('Cant. Ingreso', 'Cant Salida', 'Ingreso y Salida',
+    'Cant. Reg. Ingreso/Salida') dependen solo del material; las cantidades
+    ('Ingreso/Salida {año}', 'Cant. Ingreso. (501/561)', 'Cant. Salida.')
+    del material y su tipo. Con `diagnostico` se mide cada grupo por separado.
+    """
+    with medir_etapa(diagnostico, 'movimientos: conteos', len(indice)) as medida:
+        conteos = _conteos_por_material(indice)
+        medida['filas_salida'] = len(conteos)
+    with medir_etapa(diagnostico, 'movimientos: cantidades por año', len(indice)) as medida:
+        cantidades = _cantidades_por_material_tipo(indice, anios)
+        medida['filas_salida'] = len(cantidades)
+
+    with medir_etapa(diagnostico, 'movimientos: unión', len(df)) as medida:
+        df = df.join(conteos[['Cant. Ingreso', 'Cant Salida', 'Ingreso y Salida']], on='Material')
+        df = df.join(cantidades, on=['Material', 'Tipo material'])
+        df['Cant. Reg. Ingreso'] = df['Cant. Ingreso']
+        df['Cant. Reg. Salida'] = df['Cant Salida']
+
+        columnas_conteo = ['Cant. Ingreso', 'Cant Salida', 'Ingreso y Salida', 'Cant. Reg. Ingreso', 'Cant. Reg. Salida']
+        df[columnas_conteo] = df[columnas_conteo].fillna(0).astype('int64')
+        df[cantidades.columns] = df[cantidades.columns].fillna(0).astype(cantidades.dtypes.to_dict())
+        medida['filas_salida'] = len(df)
+    return df
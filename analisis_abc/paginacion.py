@@ -0,0 +1,37 @@
+"""Paginación de la tabla principal en el servidor.
+
+La aplicación guarda la tabla completa una sola vez y al navegador solo
+envía la página visible, ya filtrada por zona y ordenada.
+"""
+
+import math
+from typing import NamedTuple
+
+
+class PaginaTabla(NamedTuple):
+    filas: object
+    total_filas: int
+    total_paginas: int
+    pagina: int
+
+
+def paginar_tabla(df, columnas=None, zonas=None, orden=None, ascendente=True, pagina=1, filas_por_pagina=100):
+    """Filtra `df` por `zonas`, lo ordena por `orden` y devuelve solo la página pedida.
+
+    El orden es estable: a igualdad de valor se mantiene el orden de la
+    clasificación ABC. Una página fuera de rango se ajusta a la primera o
+    a la última.
+    """
+    if zonas:
+        df = df[df['Zona'].isin(zonas)]
+    if orden:
+        df = df.sort_values(orden, ascending=ascendente, kind='stable')
+
+    total_filas = len(df)
+    total_paginas = max(math.ceil(total_filas / filas_por_pagina), 1)
+    pagina = min(max(pagina, 1), total_paginas)
+    inicio = (pagina - 1) * filas_por_pagina
+    filas = df.iloc[inicio:inicio + filas_por_pagina]
+    if columnas is not None:
+        filas = filas[columnas]
+    return PaginaTabla(filas, total_filas, total_paginas, pagina)
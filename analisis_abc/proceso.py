@@ -0,0 +1,228 @@
+"""Pipeline del análisis ABC para una combinación de filtros.
+
+Cada etapa es una función pura sobre DataFrames, sin Streamlit, para poder
+usarla desde la aplicación, en lote o desde la línea de comandos.
+"""
+
+import re
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from analisis_abc.diagnostico import medir_etapa
+from analisis_abc.movimientos import agregar_columnas_movimiento, anios_movimiento, construir_indice_movimientos
+from analisis_abc.solicitudes import buscar_solicitud_pedido, construir_indice_solicitudes
+from analisis_abc.stock import (
+    agregar_stock_total_vnv,
+    calcular_cant_comp,
+    calcular_porcentual,
+    construir_tabla_stock,
+)
+
+# Las columnas 'Ingreso {año}' y 'Salida {año}' van entre estos dos bloques,
+# un par por cada ejercicio con movimientos (ver columnas_proceso)
+COLUMNAS_PROCESO_INICIO = [
+    'Material', 'Nºmaterial ant.', 'Denominación', 'Quien Compra', 'Area Solicitantes',
+    'Stock Máximo', 'Stock Mínimo', 'Tipo material', 'Stock Total',
+    'Stock Real', 'Stock Total (V-NV)', 'UM base', 'Porcentual',
+    'Cant a Comp.', 'Solicitud Pedido', 'Cant. Ingreso', 'Cant Salida',
+    'Ingreso y Salida',
+]
+
+COLUMNAS_PROCESO_FIN = [
+    'Cant. Ingreso. (501/561)', 'Cant. Salida.',
+    'Cant. Reg. Ingreso', 'Cant. Reg. Salida', 'Cant. Mov.',
+    'Mov. Acumulado', '% De Mov. Acumulado', 'Zona', '% Porcentaje',
+]
+
+_COLUMNA_INGRESO_ANIO = re.compile(r'Ingreso (\d{4})$')
+
+COLUMNAS_RESUMEN = [
+    'Zona', 'Nro de Materiales', '% de Materiales',
+    '% Acumulado', '% Movimiento', '% de Movimiento acumulado',
+]
+
+COLUMNAS_FILTRO = ['Quien Compra', 'Tipo material', 'Area Solicitantes']
+
+# Materiales que quedan tras cada filtro del pipeline (ResultadoABC.conteos)
+CONTEOS_FILTRO = ['Filtros iniciales', 'Cant a Comp. numérica', 'Sin solicitud de pedido']
+
+# Cortes de zona en % de Mov. Acumulado: A por debajo del primero, B por debajo del segundo, C el resto
+UMBRALES_ZONAS = (80, 95)
+
+
+def columnas_proceso(anios):
+    """Columnas de la tabla principal, con 'Ingreso {año}' y 'Salida {año}' por cada año."""
+    columnas_anio = [columna for anio in anios for columna in (f'Ingreso {anio}', f'Salida {anio}')]
+    return COLUMNAS_PROCESO_INICIO + columnas_anio + COLUMNAS_PROCESO_FIN
+
+
+def anios_de_tabla(tabla):
+    """Años de las columnas 'Ingreso {año}' de una tabla ya procesada."""
+    return [int(m.group(1)) for m in map(_COLUMNA_INGRESO_ANIO.match, tabla.columns) if m]
+
+
+class Agregados(NamedTuple):
+    """Tablas precalculadas una vez por archivo y compartidas por todas las combinaciones."""
+    tabla_stock: pd.Series
+    indice_movimientos: pd.DataFrame
+    indice_solicitudes: pd.Series
+
+
+class ResultadoABC(NamedTuple):
+    tabla: pd.DataFrame
+    resumen: pd.DataFrame
+    conteos: dict
+
+
+def construir_agregados(zm009, mb51, sc, indice_movimientos=None):
+    """Con `indice_movimientos` (por ejemplo, el de un HistorialMovimientos)
+    no se recalcula el índice a partir de `mb51`."""
+    if indice_movimientos is None:
+        indice_movimientos = construir_indice_movimientos(mb51)
+    return Agregados(
+        tabla_stock=construir_tabla_stock(zm009),
+        indice_movimientos=indice_movimientos,
+        indice_solicitudes=construir_indice_solicitudes(sc),
+    )
+
+
+def filtrar_materiales(zm009, quien_compra, tipo_material, area, indice_filtros=None):
+    """Filas de ZMM009 de la combinación. Con `indice_filtros` (un
+    analisis_abc.filtros.IndiceFiltros de la misma hoja) se toman sus
+    posiciones sin comparar toda la hoja."""
+    if indice_filtros is not None:
+        return zm009.take(indice_filtros.posiciones(quien_compra, tipo_material, area)).reset_index(drop=True)
+
+    df = zm009[
+        (zm009['Quien Compra'] == quien_compra) &
+        (zm009['Tipo material'] == tipo_material) &
+        (zm009['Area Solicitantes'] == area)
+    ]
+    return df.reset_index(drop=True)
+
+
+def calcular_cantidad_a_comprar(df, tabla_stock, diagnostico=None):
+    """Añade Stock Total (V-NV), Porcentual y Cant a Comp. y deja solo las
+    filas con una cantidad a comprar numérica."""
+    with medir_etapa(diagnostico, 'Stock Total (V-NV)', len(df)) as medida:
+        # Copia superficial: las columnas nuevas no tocan el DataFrame recibido y no se duplican los datos
+        df = agregar_stock_total_vnv(df.copy(deep=False), tabla_stock)
+        medida['filas_salida'] = len(df)
+
+    with medir_etapa(diagnostico, 'Cant a Comp.', len(df)) as medida:
+        # Porcentual (AD)
+        df['Porcentual'] = calcular_porcentual(df)
+
+        # Cant a Comp. (AF)
+        df['Cant a Comp.'] = calcular_cant_comp(df)
+
+        # Excluimos "NA" y "No Comp"
+        df = df[~df['Cant a Comp.'].isin(['NA', 'No Comp'])]
+        medida['filas_salida'] = len(df)
+    return df
+
+
+def quitar_con_solicitud(df, indice_solicitudes, diagnostico=None):
+    """Añade Solicitud Pedido (AK) y deja solo los materiales sin solicitud previa."""
+    with medir_etapa(diagnostico, 'SC: solicitud de pedido', len(df)) as medida:
+        df = df.copy(deep=False)
+        df['Solicitud Pedido'] = buscar_solicitud_pedido(df['Material'], indice_solicitudes)
+        df = df[df['Solicitud Pedido'] == ""]
+        medida['filas_salida'] = len(df)
+    return df
+
+
+def agregar_movimientos(df, indice_movimientos, anios=None, diagnostico=None):
+    """Añade las columnas de movimientos MB51 (AP a BD) y Cant. Mov. (BE).
+
+    Sin `anios` se usan todos los ejercicios con movimientos del índice.
+    """
+    if anios is None:
+        anios = anios_movimiento(indice_movimientos)
+    df = agregar_columnas_movimiento(df, indice_movimientos, anios, diagnostico)
+    df['Cant. Mov.'] = df['Cant. Reg. Ingreso'] + df['Cant. Reg. Salida']
+    return df
+
+
+def clasificar_abc(df):
+    """Ordena por Cant. Mov. y calcula Mov. Acumulado, % De Mov. Acumulado, Zona y % Porcentaje."""
+    df = df.sort_values('Cant. Mov.', ascending=False).reset_index(drop=True)
+
+    # Mov. Acumulado (BF)
+    df['Mov. Acumulado'] = df['Cant. Mov.'].cumsum()
+
+    # % De Mov. Acumulado (BG)
+    total_mov = df['Cant. Mov.'].sum()
+    df['% De Mov. Acumulado'] = (df['Mov. Acumulado'] / total_mov * 100) if total_mov > 0 else 0
+
+    # Zona (BH): A hasta el 80 %, B hasta el 95 %, C el resto
+    porcentaje = df['% De Mov. Acumulado']
+    corte_a, corte_b = UMBRALES_ZONAS
+    df['Zona'] = np.select([porcentaje < corte_a, porcentaje < corte_b], ['A', 'B'], default='C')
+
+    # % Porcentaje (BI): en la última fila de cada zona, lo que aporta esa zona al acumulado
+    df['% Porcentaje'] = pd.Series("", index=df.index, dtype=object)
+    maximo_anterior = 0
+    for zona in ['A', 'B', 'C']:
+        df_zona = df[df['Zona'] == zona]
+        if len(df_zona) > 0:
+            ultimo_idx = df_zona.index[-1]
+            df.loc[ultimo_idx, '% Porcentaje'] = df.loc[ultimo_idx, '% De Mov. Acumulado'] - maximo_anterior
+            maximo_anterior = df_zona['% De Mov. Acumulado'].max()
+        else:
+            maximo_anterior = 0
+    return df
+
+
+def resumen_abc(df):
+    """Cuadro resumen por zona, ordenado A, B, C."""
+    resumen = df.groupby('Zona').agg({
+        'Material': 'count',
+        'Cant. Mov.': 'sum'
+    }).reset_index()
+
+    resumen.columns = ['Zona', 'Nro de Materiales', 'Total Movimientos']
+
+    total_materiales = resumen['Nro de Materiales'].sum()
+    total_movimientos = resumen['Total Movimientos'].sum()
+
+    resumen['% de Materiales'] = (resumen['Nro de Materiales'] / total_materiales * 100).round(2)
+    resumen['% Acumulado'] = resumen['% de Materiales'].cumsum().round(2)
+    resumen['% Movimiento'] = (resumen['Total Movimientos'] / total_movimientos * 100).round(2)
+    resumen['% de Movimiento acumulado'] = resumen['% Movimiento'].cumsum().round(2)
+
+    resumen['Zona'] = pd.Categorical(resumen['Zona'], categories=['A', 'B', 'C'], ordered=True)
+    return resumen.sort_values('Zona')
+
+
+def procesar_area(zm009, agregados, quien_compra, tipo_material, area, anios=None, diagnostico=None):
+    """Ejecuta el pipeline completo para una combinación de filtros.
+
+    `conteos` guarda cuántos materiales quedan tras cada filtro de
+    CONTEOS_FILTRO. Si alguno deja la tabla vacía, el pipeline se detiene
+    ahí, los filtros siguientes cuentan 0 y `resumen` es None.
+    Con un `diagnostico` (analisis_abc.diagnostico.Diagnostico) se mide cada etapa.
+    """
+    conteos = dict.fromkeys(CONTEOS_FILTRO, 0)
+    df = filtrar_materiales(zm009, quien_compra, tipo_material, area)
+    conteos['Filtros iniciales'] = len(df)
+
+    if len(df) > 0:
+        df = calcular_cantidad_a_comprar(df, agregados.tabla_stock, diagnostico)
+        conteos['Cant a Comp. numérica'] = len(df)
+
+    if len(df) > 0:
+        df = quitar_con_solicitud(df, agregados.indice_solicitudes, diagnostico)
+        conteos['Sin solicitud de pedido'] = len(df)
+
+    if len(df) == 0:
+        return ResultadoABC(df, None, conteos)
+
+    df = agregar_movimientos(df, agregados.indice_movimientos, anios, diagnostico)
+    with medir_etapa(diagnostico, 'ABC: zonas', len(df)) as medida:
+        df = clasificar_abc(df)
+        resumen = resumen_abc(df)
+        medida['filas_salida'] = len(resumen)
+    return ResultadoABC(df, resumen, conteos)
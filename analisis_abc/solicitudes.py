@@ -0,0 +1,15 @@
+"""Índice de solicitudes de pedido de la hoja SC."""
+
+import pandas as pd
+
+
+def construir_indice_solicitudes(sc):
+    """Relaciona cada 'Cod. SAP' con la primera 'Solicitud \\nPedido' en que aparece."""
+    sc = sc[sc['Cod. SAP'].notna()].drop_duplicates('Cod. SAP', keep='first')
+    return pd.Series(sc['Solicitud \nPedido'].to_numpy(), index=sc['Cod. SAP'].to_numpy(), name='Solicitud Pedido')
+
+
+def buscar_solicitud_pedido(materiales, indice):
+    """Devuelve la solicitud de cada material, o "" si no tiene ninguna en SC."""
+    solicitudes = materiales.map(indice).astype(object)
+    return solicitudes.where(materiales.isin(indice.index), "")
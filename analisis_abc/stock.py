@@ -0,0 +1,71 @@
+"""Consolidación de stock ZMM009 y reglas de cantidad a comprar.
+
+El stock total (V-NV) se suma por Nºmaterial ant. y almacén cuando el
+material tiene número anterior, o por Material y almacén cuando no lo
+tiene. Ambas sumas se precalculan una sola vez en una tabla y se leen con
+un único join.
+"""
+
+import numpy as np
+import pandas as pd
+
+ORIGEN_ANTERIOR = 'Nºmaterial ant.'
+ORIGEN_MATERIAL = 'Material'
+
+
+def construir_tabla_stock(zm009):
+    """Suma 'Stock Real' por (origen de la clave, clave, almacén).
+
+    El origen indica si la clave es un Nºmaterial ant. o un Material, para
+    que un mismo valor en ambas columnas no se mezcle.
+    """
+    stock_real = zm009['Stock Real']
+    if pd.api.types.is_integer_dtype(stock_real):
+        # La hoja compactada guarda int32; la suma se hace en int64 para que no desborde
+        stock_real = stock_real.astype('int64')
+    tablas = [
+        stock_real.groupby([zm009[origen], zm009['Almacén']], observed=True).sum()
+        for origen in (ORIGEN_ANTERIOR, ORIGEN_MATERIAL)
+    ]
+    tabla = pd.concat(tablas, keys=[ORIGEN_ANTERIOR, ORIGEN_MATERIAL])
+    tabla.index = tabla.index.set_names(['Origen', 'Clave', 'Almacén'])
+    return tabla.rename('Stock Total (V-NV)')
+
+
+def agregar_stock_total_vnv(df, tabla):
+    """Añade 'Stock Total (V-NV)' a `df` leyendo la tabla precalculada."""
+    tiene_anterior = df['Nºmaterial ant.'].notna()
+    claves = pd.DataFrame({
+        'Origen': np.where(tiene_anterior, ORIGEN_ANTERIOR, ORIGEN_MATERIAL),
+        'Clave': df['Nºmaterial ant.'].astype(object).where(tiene_anterior, df['Material'].astype(object)),
+        'Almacén': df['Almacén'].astype(object),
+    }, index=df.index)
+
+    stock = claves.join(tabla, on=['Origen', 'Clave', 'Almacén'])['Stock Total (V-NV)'].fillna(0)
+    if pd.api.types.is_integer_dtype(tabla):
+        stock = stock.astype(tabla.dtype)
+    df['Stock Total (V-NV)'] = stock
+    return df
+
+
+def calcular_porcentual(df):
+    """(Stock Total V-NV - Stock Mínimo) / (Stock Máximo - Stock Mínimo) * 100,
+    o 0 si falta alguno de los límites o son iguales."""
+    maximo = df['Stock Máximo']
+    minimo = df['Stock Mínimo']
+    valido = maximo.notna() & minimo.notna() & (maximo != minimo)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        porcentual = (df['Stock Total (V-NV)'] - minimo) / (maximo - minimo) * 100
+    return pd.Series(np.where(valido, porcentual, 0), index=df.index, dtype='float64')
+
+
+def calcular_cant_comp(df):
+    """SI(Stock Máximo <> 0; SI(Porcentual <= 10%; Stock Máximo - Stock Total V-NV; "No Comp"); "NA")"""
+    maximo = df['Stock Máximo']
+    sin_maximo = (maximo.isna() | (maximo == 0)).to_numpy()
+    comprar = (df['Porcentual'] <= 10).to_numpy()
+    cantidad = (maximo - df['Stock Total (V-NV)']).to_numpy(dtype=object)
+
+    cant_comp = np.select([sin_maximo, comprar], [np.array("NA", dtype=object), cantidad], default="No Comp")
+    return pd.Series(cant_comp, index=df.index, dtype=object)
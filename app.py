@@ -1,15 +1,106 @@
+import logging
+import os
+
 import streamlit as st
-import pandas as pd
-import numpy as np
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import io
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-import numpy as np
-from matplotlib.lines import Line2D
+
+from analisis_abc import (
+    COLUMNAS_RESUMEN,
+    UMBRALES_ZONAS,
+    Diagnostico,
+    HistorialMovimientos,
+    IndiceFiltros,
+    agregar_movimientos,
+    anios_movimiento,
+    barrido_abc,
+    calcular_cantidad_a_comprar,
+    clasificar_abc,
+    columnas_proceso,
+    combinaciones_disponibles,
+    compactar_libro,
+    construir_agregados,
+    figura_abc,
+    filtrar_materiales,
+    huella_contenido,
+    imagen_abc_png,
+    informe_memoria,
+    leer_libro_sap,
+    libro_excel_abc,
+    libro_lote_excel,
+    metricas_escenario,
+    paginar_tabla,
+    procesar_lote,
+    quitar_con_solicitud,
+    resumen_abc,
+    tabla_resumen_lote,
+)
 
 st.set_page_config(page_title="Análisis ABC Repuestos", layout="wide")
+
+# Diagnóstico: una línea JSON por etapa en el log del servidor
+logging.basicConfig(level=logging.WARNING)
+logging.getLogger('analisis_abc.diagnostico').setLevel(logging.INFO)
+
+# Carpeta del historial persistente de MB51 en el servidor
+CARPETA_HISTORIAL = os.environ.get('ANALISIS_ABC_HISTORIAL', 'historial_mb51')
+
+# Cuántos libros distintos se mantienen en memoria y durante cuánto tiempo
+MAX_LIBROS_EN_CACHE = int(os.environ.get('ANALISIS_ABC_MAX_LIBROS', '4'))
+DURACION_CACHE = os.environ.get('ANALISIS_ABC_DURACION_CACHE', '12h')
+
+
+# Las funciones en caché se indexan por la huella del archivo; los argumentos con "_" no se hashean.
+# cache_resource devuelve el mismo objeto a todas las sesiones, sin copiarlo: las hojas y los
+# agregados son de solo lectura (el pipeline nunca los modifica).
+@st.cache_resource(show_spinner=False, max_entries=MAX_LIBROS_EN_CACHE, ttl=DURACION_CACHE)
+def cargar_libro(huella, _datos):
+    # Solo se guarda el libro compactado; el original se descarta tras medirlo
+    original = leer_libro_sap(_datos, compactar=False)
+    libro = compactar_libro(original)
+    return libro, informe_memoria(original, libro)
+
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_LIBROS_EN_CACHE, ttl=DURACION_CACHE)
+def cargar_indice_filtros(huella, _zm009):
+    return IndiceFiltros(_zm009)
+
+
+# Agrega el MB51 del archivo al historial una vez por sesión; se vuelve a llamar a `agregar` si
+# cambia el historial (otra carga, o la carpeta se borró) para no dar por guardado lo que ya no está
+def actualizar_historial(huella, carpeta, mb51):
+    historial = HistorialMovimientos(carpeta)
+    clave = (huella, str(historial.carpeta))
+    anterior = st.session_state.get('historial_agregado')
+    version = historial.version()
+    if anterior is not None and anterior['clave'] == clave and version is not None and anterior['version'] == version:
+        return anterior['nuevos']
+    nuevos = historial.agregar(mb51)
+    st.session_state['historial_agregado'] = {'clave': clave, 'version': historial.version(), 'nuevos': nuevos}
+    return nuevos
+
+
+# `version_historial` cambia cuando cualquier sesión agrega movimientos al historial, para no
+# seguir usando un índice anterior a esa carga
+@st.cache_resource(show_spinner=False, max_entries=MAX_LIBROS_EN_CACHE, ttl=DURACION_CACHE)
+def cargar_agregados(huella, carpeta_historial, version_historial, _zm009, _mb51, _sc):
+    indice_movimientos = HistorialMovimientos(carpeta_historial).indice() if carpeta_historial else None
+    return construir_agregados(_zm009, _mb51, _sc, indice_movimientos)
+
+
+# Streamlit solo llama a la función de `data` cuando se pulsa el botón de descarga, después de
+# dibujar la página y sin volver a ejecutarla: sus etapas se guardan en `descarga` (un Diagnostico
+# de la sesión) y el expander de diagnóstico las muestra en la siguiente ejecución
+def excel_al_descargar(df, resumen, titulo, diagnostico, descarga):
+    def generar():
+        descarga.contexto = dict(diagnostico.contexto)
+        descarga.etapas.clear()
+        # Gráfico ABC recreado con matplotlib e incrustado en el Excel
+        with descarga.etapa('gráfico matplotlib'):
+            imagen_png = imagen_abc_png(resumen, titulo)
+        with descarga.etapa('libro Excel', len(df)):
+            return libro_excel_abc(df, resumen, imagen_png)
+    return generar
+
+
 col_logo, col_titulo = st.columns([1, 4])
 
 with col_logo:
@@ -27,13 +118,38 @@ uploaded_file = st.file_uploader("Sube tu archivo Excel de SAP", type=['xlsx'])
 if uploaded_file:
     st.success("✅ Archivo cargado ")
     
+    diagnostico = Diagnostico({'archivo': uploaded_file.name})
+    diagnostico_descarga = st.session_state.setdefault('diagnostico_descarga', Diagnostico())
+    
     with st.spinner("Cargando datos..."):
-        zm009 = pd.read_excel(uploaded_file, sheet_name='ZMM009')
-        mb51 = pd.read_excel(uploaded_file, sheet_name='MB51')
-        sc = pd.read_excel(uploaded_file, sheet_name='SC')
+        datos_archivo = uploaded_file.getvalue()
+        huella_archivo = huella_contenido(datos_archivo)
+        with diagnostico.etapa('lectura Excel') as medida:
+            (zm009, mb51, sc), memoria_hojas = cargar_libro(huella_archivo, datos_archivo)
+            medida['filas_salida'] = len(zm009) + len(mb51) + len(sc)
+        with diagnostico.etapa('índice de filtros', len(zm009)):
+            indice_filtros = cargar_indice_filtros(huella_archivo, zm009)
     
     st.info(f"📋 Registros cargados - ZMM009: {len(zm009)} | MB51: {len(mb51)} | SC: {len(sc)}")
     
+# Historial MB51: se suben solo los movimientos recientes y se suman a los ya guardados
+    carpeta_historial = None
+    if st.checkbox("🗄️ Acumular MB51 en el historial y usar todos los movimientos guardados"):
+        try:
+            with diagnostico.etapa('historial MB51', len(mb51)) as medida:
+                nuevos = actualizar_historial(huella_archivo, CARPETA_HISTORIAL, mb51)
+                medida['filas_salida'] = nuevos
+# ValueError: faltan columnas clave; TypeError/OSError: pyarrow o el disco no pudieron guardar la carga
+        except (ValueError, TypeError, OSError) as error:
+            st.error(f"❌ No se pudo actualizar el historial: {error}")
+        else:
+            carpeta_historial = CARPETA_HISTORIAL
+            st.info(f"🗄️ Movimientos nuevos agregados al historial: {nuevos}")
+    
+    with diagnostico.etapa('agregados (stock, MB51, SC)', len(zm009) + len(mb51) + len(sc)):
+        version_historial = HistorialMovimientos(carpeta_historial).version() if carpeta_historial else None
+        agregados = cargar_agregados(huella_archivo, carpeta_historial, version_historial, zm009, mb51, sc)
+    
     with st.expander("👁️ Vista previa"):
         tab1, tab2, tab3 = st.tabs(["ZMM009", "MB51", "SC"])
         
@@ -52,413 +168,204 @@ if uploaded_file:
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        opciones_quien_compra = zm009['Quien Compra'].dropna().unique().tolist()
-        quien_compra_sel = st.selectbox("Quien Compra:", opciones_quien_compra)
+        quien_compra_sel = st.selectbox("Quien Compra:", indice_filtros.quien_compra())
     
     with col2:
-        opciones_tipo_material = zm009['Tipo material'].dropna().unique().tolist()
-        tipo_material_sel = st.selectbox("Tipo Material:", opciones_tipo_material)
+        tipo_material_sel = st.selectbox("Tipo Material:", indice_filtros.tipos_material(quien_compra_sel))
     
     with col3:
-        zm009_filtrado_temp = zm009[zm009['Quien Compra'] == quien_compra_sel]
-        opciones_areas = sorted(zm009_filtrado_temp['Area Solicitantes'].dropna().unique().tolist())
-        area_seleccionada = st.selectbox("Área Solicitante:", opciones_areas)
+        area_seleccionada = st.selectbox("Área Solicitante:", indice_filtros.areas(quien_compra_sel, tipo_material_sel))
+    
+# Ejercicios de MB51 con movimientos; las columnas Ingreso/Salida {año} se limitan a la ventana elegida
+    anios_disponibles = anios_movimiento(agregados.indice_movimientos)
+    anios_seleccionados = anios_disponibles
+    if len(anios_disponibles) > 1:
+        desde, hasta = st.select_slider("Ejercicios de movimientos:", options=anios_disponibles,
+                                        value=(anios_disponibles[0], anios_disponibles[-1]))
+        anios_seleccionados = anios_movimiento(agregados.indice_movimientos, desde, hasta)
     
     if st.button("Procesar Datos", type="primary"):
         with st.spinner("Aplicando filtros y calculando valores, espere..."):
             
-            df = zm009.copy()
-            df = df[df['Quien Compra'] == quien_compra_sel]
-            df = df[df['Tipo material'] == tipo_material_sel]
-            df = df[df['Area Solicitantes'] == area_seleccionada]
-            df = df.reset_index(drop=True)
+            diagnostico.contexto.update({'quien_compra': quien_compra_sel, 'tipo_material': tipo_material_sel,
+                                         'area': area_seleccionada})
+# El resultado se guarda una sola vez en la sesión; paginar, ordenar o filtrar no lo recalcula
+            resultado = {'huella': huella_archivo, 'area': area_seleccionada, 'anios': anios_seleccionados,
+                         'mensajes': [], 'df': None}
+            st.session_state['resultado_abc'] = resultado
+            st.session_state['pagina_abc'] = 1
+            df = filtrar_materiales(zm009, quien_compra_sel, tipo_material_sel, area_seleccionada, indice_filtros)
             
-            st.write(f"### 📊 Materiales encontrados con filtros iniciales: {len(df)}")
+            resultado['mensajes'].append((f"### 📊 Materiales encontrados con filtros iniciales: {len(df)}",
+                                          "⚠️ No se encontraron materiales con los filtros aplicados." if len(df) == 0 else None))
             
-            if len(df) == 0:
-                st.warning("⚠️ No se encontraron materiales con los filtros aplicados.")
-            else:
-                
+            if len(df) > 0:
 # Calculando columnas básicas
-                
-                def calcular_stock_total_vnv(row):
-                    almacen = row['Almacén']
-                    
-                    if pd.notna(row['Nºmaterial ant.']):
-                        return zm009[
-                            (zm009['Nºmaterial ant.'] == row['Nºmaterial ant.']) &
-                            (zm009['Almacén'] == almacen)
-                        ]['Stock Real'].sum()
-                    else:
-                        return zm009[
-                            (zm009['Material'] == row['Material']) &
-                            (zm009['Almacén'] == almacen)
-                        ]['Stock Real'].sum()
-                
-                df['Stock Total (V-NV)'] = df.apply(calcular_stock_total_vnv, axis=1)
-                
-# Porcentual (AD)
-# Fórmula: (Stock Total V-NV - Stock Mínimo) / (Stock Máximo - Stock Mínimo) * 100
-                df['Porcentual'] = df.apply(
-                    lambda row: ((row['Stock Total (V-NV)'] - row['Stock Mínimo']) / 
-                                 (row['Stock Máximo'] - row['Stock Mínimo']) * 100)
-                    if (pd.notna(row['Stock Máximo']) and pd.notna(row['Stock Mínimo']) and 
-                        row['Stock Máximo'] != row['Stock Mínimo']) else 0,
-                    axis=1
-                )
-                
-# Cant a Comp. (AF)
-# Fórmula: SI(Stock Máximo <> 0; SI(Porcentual <= 10%; Stock Máximo - Stock Total V-NV; "No Comp"); "NA")
-                def calcular_cant_comp(row):
-                    if pd.isna(row['Stock Máximo']) or row['Stock Máximo'] == 0:
-                        return "NA"
-                    porcentual = row['Porcentual']
-                    if porcentual <= 10:
-                        return row['Stock Máximo'] - row['Stock Total (V-NV)']
-                    else:
-                        return "No Comp"
-                
-                df['Cant a Comp.'] = df.apply(calcular_cant_comp, axis=1)
-                
-# Excluimos "NA" y "No Comp"
-                df = df[~df['Cant a Comp.'].isin(['NA', 'No Comp'])].copy()
-                st.write(f"**Después de filtrar Cant a Comp. (solo números):** {len(df)}")
-                
-                if len(df) == 0:
-                    st.warning("⚠️ No hay materiales con cantidad a comprar numérica.")
-                else:
-# Solicitud Pedido (AK)
-                    df['Solicitud Pedido'] = df['Material'].apply(
-                        lambda x: sc[sc['Cod. SAP'] == x]['Solicitud \nPedido'].values[0] 
-                        if len(sc[sc['Cod. SAP'] == x]) > 0 else ""
-                    )
-                    
-# Solo vacíos (Que no tengan solicitud de pedido)
-                    df = df[df['Solicitud Pedido'] == ""].copy()
-                    st.write(f"**Después de filtrar Solicitud Pedido (solo vacíos):** {len(df)}")
-                    
-                    if len(df) == 0:
-                        st.warning("⚠️ Todos los materiales ya tienen solicitud/pedido previo.")
-                    else:
-                        
-# Calcular columnas de movimientos
-                        
-# Cant. Ingreso (AP)
-                        df['Cant. Ingreso'] = df['Material'].apply(
-                            lambda x: len(mb51[(mb51['Material'] == x) & (mb51['Indicador Debe/Haber'] == 'S')])
-                        )
-                        
-# Cant Salida (AQ)
-                        df['Cant Salida'] = df['Material'].apply(
-                            lambda x: len(mb51[(mb51['Material'] == x) & (mb51['Indicador Debe/Haber'] == 'H')])
-                        )
-                        
-# Ingreso y Salida (AR)
-                        df['Ingreso y Salida'] = df['Material'].apply(
-                            lambda x: len(mb51[mb51['Material'] == x])
-                        )
-                        
-# Ingresos y Salidas por año (2022 - hasta que el cuerpo aguante)
-                        for year in [2022, 2023, 2024, 2025, 2026]:
-# Ingreso
-                            df[f'Ingreso {year}'] = df.apply(
-                                lambda row: mb51[
-                                    (mb51['Material'] == row['Material']) &
-                                    (mb51['Indicador Debe/Haber'] == 'S') &
-                                    (mb51['Tipo material'] == row['Tipo material']) &
-                                    (mb51['Ejerc.documento mat.'] == year)
-                                ]['Cantidad'].sum(),
-                                axis=1
-                            )
-                            
-# Salida
-                            df[f'Salida {year}'] = df.apply(
-                                lambda row: mb51[
-                                    (mb51['Material'] == row['Material']) &
-                                    (mb51['Indicador Debe/Haber'] == 'H') &
-                                    (mb51['Tipo material'] == row['Tipo material']) &
-                                    (mb51['Ejerc.documento mat.'] == year)
-                                ]['Cantidad'].sum(),
-                                axis=1
-                            )
-                        
-# Cant. Ingreso (501/561) (BA)
-                        df['Cant. Ingreso. (501/561)'] = df.apply(
-                            lambda row: mb51[
-                                (mb51['Material'] == row['Material']) &
-                                (mb51['Indicador Debe/Haber'] == 'S') &
-                                (mb51['Tipo material'] == row['Tipo material'])
-                            ]['Cantidad'].sum(),
-                            axis=1
-                        )
-                        
-# Cant. Salida. (BB)
-                        df['Cant. Salida.'] = df.apply(
-                            lambda row: mb51[
-                                (mb51['Material'] == row['Material']) &
-                                (mb51['Indicador Debe/Haber'] == 'H') &
-                                (mb51['Tipo material'] == row['Tipo material'])
-                            ]['Cantidad'].sum(),
-                            axis=1
-                        )
-                        
-# Cant. Reg. Ingreso (BC)
-                        df['Cant. Reg. Ingreso'] = df['Material'].apply(
-                            lambda x: len(mb51[(mb51['Material'] == x) & (mb51['Indicador Debe/Haber'] == 'S')])
-                        )
-                        
-# Cant. Reg. Salida (BD)
-                        df['Cant. Reg. Salida'] = df['Material'].apply(
-                            lambda x: len(mb51[(mb51['Material'] == x) & (mb51['Indicador Debe/Haber'] == 'H')])
-                        )
-                        
- # Cant. Mov. (BE)
-                        df['Cant. Mov.'] = df['Cant. Reg. Ingreso'] + df['Cant. Reg. Salida']
-                        
-# Análisis ABC de los materiales                    
-# Ordenar por Cant. Mov. descendente
-                        df = df.sort_values('Cant. Mov.', ascending=False).reset_index(drop=True)
-                        
-# Mov. Acumulado (BF)
-                        df['Mov. Acumulado'] = df['Cant. Mov.'].cumsum()
-                        
-# % De Mov. Acumulado (BG)
-                        total_mov = df['Cant. Mov.'].sum()
-                        df['% De Mov. Acumulado'] = (df['Mov. Acumulado'] / total_mov * 100) if total_mov > 0 else 0
-                        
-# Zona (BH)
-                        def clasificar_zona(porcentaje):
-                            if porcentaje < 80:
-                                return 'A'
-                            elif porcentaje < 95:
-                                return 'B'
-                            else:
-                                return 'C'
-                        
-                        df['Zona'] = df['% De Mov. Acumulado'].apply(clasificar_zona)
-                        
-# % Porcentaje (BI)
-                        df['% Porcentaje'] = ""
-                        
-                        for zona in ['A', 'B', 'C']:
-                            df_zona = df[df['Zona'] == zona]
-                            if len(df_zona) > 0:
-                                ultimo_idx = df_zona.index[-1]
-                                if zona == 'A':
-                                    df.loc[ultimo_idx, '% Porcentaje'] = df.loc[ultimo_idx, '% De Mov. Acumulado']
-                                elif zona == 'B':
-                                    max_a = df[df['Zona'] == 'A']['% De Mov. Acumulado'].max() if len(df[df['Zona'] == 'A']) > 0 else 0
-                                    df.loc[ultimo_idx, '% Porcentaje'] = df.loc[ultimo_idx, '% De Mov. Acumulado'] - max_a
-                                elif zona == 'C':
-                                    max_b = df[df['Zona'] == 'B']['% De Mov. Acumulado'].max() if len(df[df['Zona'] == 'B']) > 0 else 0
-                                    df.loc[ultimo_idx, '% Porcentaje'] = df.loc[ultimo_idx, '% De Mov. Acumulado'] - max_b
+# Stock Total (V-NV), Porcentual (AD) y Cant a Comp. (AF); excluimos "NA" y "No Comp"
+                df = calcular_cantidad_a_comprar(df, agregados.tabla_stock, diagnostico)
+                resultado['mensajes'].append((f"**Después de filtrar Cant a Comp. (solo números):** {len(df)}",
+                                              "⚠️ No hay materiales con cantidad a comprar numérica." if len(df) == 0 else None))
+            
+            if len(df) > 0:
+# Solicitud Pedido (AK): solo vacíos (que no tengan solicitud de pedido)
+                df = quitar_con_solicitud(df, agregados.indice_solicitudes, diagnostico)
+                resultado['mensajes'].append((f"**Después de filtrar Solicitud Pedido (solo vacíos):** {len(df)}",
+                                              "⚠️ Todos los materiales ya tienen solicitud/pedido previo." if len(df) == 0 else None))
+            
+            if len(df) > 0:
+# Calcular columnas de movimientos (AP a BE) y análisis ABC (BF a BI)
+                df = agregar_movimientos(df, agregados.indice_movimientos, anios_seleccionados, diagnostico)
+                with diagnostico.etapa('ABC: zonas', len(df)) as medida:
+                    df = clasificar_abc(df)
+                    medida['filas_salida'] = len(df)
+                with diagnostico.etapa('ABC: resumen', len(df)) as medida:
+                    resumen = resumen_abc(df)
+                    medida['filas_salida'] = len(resumen)
+                with diagnostico.etapa('gráfico Plotly'):
+                    fig = figura_abc(resumen, f'Análisis ABC - {area_seleccionada}')
+                resultado.update({'df': df, 'resumen': resumen[COLUMNAS_RESUMEN], 'fig': fig})
+
+# Último resultado de la sesión, mientras corresponda al archivo cargado
+    resultado = st.session_state.get('resultado_abc')
+    if resultado is not None and resultado['huella'] == huella_archivo:
+        for texto, aviso in resultado['mensajes']:
+            st.write(texto)
+            if aviso:
+                st.warning(aviso)
+        
+        if resultado['df'] is not None:
+            df = resultado['df']
+            area_resultado = resultado['area']
+            
+# Mostrar la tabla principal: filtro, orden y paginación en el servidor; solo se envía la página visible
+            st.write("---")
+            st.subheader("📋 Tabla Principal - Proceso Completo")
+            
+            col_zonas, col_orden, col_sentido, col_tamano = st.columns([2, 1, 1, 1])
+            with col_zonas:
+                zonas_sel = st.multiselect("Zonas:", ['A', 'B', 'C'], key='zonas_abc')
+            with col_orden:
+                orden_sel = st.selectbox("Ordenar por:", ['Cant. Mov.', 'Zona'], key='orden_abc')
+            with col_sentido:
+                sentido_sel = st.radio("Sentido:", ['Descendente', 'Ascendente'], horizontal=True, key='sentido_abc')
+            with col_tamano:
+                filas_por_pagina = st.selectbox("Filas por página:", [50, 100, 500], index=1, key='filas_abc')
+            
+            with diagnostico.etapa('tabla: página', len(df)) as medida:
+                pagina = paginar_tabla(df, columnas_proceso(resultado['anios']), zonas_sel, orden_sel,
+                                       sentido_sel == 'Ascendente', st.session_state.get('pagina_abc', 1),
+                                       filas_por_pagina)
+                medida['filas_salida'] = len(pagina.filas)
+# Con menos filas (otro filtro de zona o tamaño de página) la página guardada se ajusta a la última
+            st.session_state['pagina_abc'] = pagina.pagina
+            
+            st.dataframe(pagina.filas, use_container_width=True, height=500)
+            
+            col_pagina, col_rango = st.columns([1, 3])
+            with col_pagina:
+                st.number_input("Página:", min_value=1, max_value=pagina.total_paginas, key='pagina_abc')
+            with col_rango:
+                inicio = (pagina.pagina - 1) * filas_por_pagina
+                st.caption(f"Filas {min(inicio + 1, pagina.total_filas)}–{inicio + len(pagina.filas)} "
+                           f"de {pagina.total_filas} (página {pagina.pagina} de {pagina.total_paginas})")
+            
+# Cuadro de resumen ABC
+            st.write("---")
+            st.subheader("📊 Cuadro Resumen - Análisis ABC")
+            
+            st.dataframe(resultado['resumen'], use_container_width=True, hide_index=True)
             
-# Mostrar la tabla principal                        
-                        st.write("---")
-                        st.subheader("📋 Tabla Principal - Proceso Completo")
-                        
-                        columnas_proceso = [
-                            'Material', 'Nºmaterial ant.', 'Denominación', 'Quien Compra', 'Area Solicitantes',
-                            'Stock Máximo', 'Stock Mínimo', 'Tipo material', 'Stock Total', 
-                            'Stock Real', 'Stock Total (V-NV)', 'UM base', 'Porcentual', 
-                            'Cant a Comp.', 'Solicitud Pedido', 'Cant. Ingreso', 'Cant Salida',
-                            'Ingreso y Salida',
-                            'Ingreso 2022', 'Salida 2022',
-                            'Ingreso 2023', 'Salida 2023',
-                            'Ingreso 2024', 'Salida 2024',
-                            'Ingreso 2025', 'Salida 2025',
-                            'Ingreso 2026', 'Salida 2026',
-                            'Cant. Ingreso. (501/561)', 'Cant. Salida.',
-                            'Cant. Reg. Ingreso', 'Cant. Reg. Salida', 'Cant. Mov.',
-                            'Mov. Acumulado', '% De Mov. Acumulado', 'Zona', '% Porcentaje'
-                        ]
-                        
-                        st.dataframe(df[columnas_proceso], use_container_width=True, height=500)
-                        
-# Cuadro de resumen ABC                        
-                        st.write("---")
-                        st.subheader("📊 Cuadro Resumen - Análisis ABC")
-                        
-                        resumen = df.groupby('Zona').agg({
-                            'Material': 'count',
-                            'Cant. Mov.': 'sum'
-                        }).reset_index()
-                        
-                        resumen.columns = ['Zona', 'Nro de Materiales', 'Total Movimientos']
-                        
-# Calcular porcentajes
-                        total_materiales = resumen['Nro de Materiales'].sum()
-                        total_movimientos = resumen['Total Movimientos'].sum()
-                        
-                        resumen['% de Materiales'] = (resumen['Nro de Materiales'] / total_materiales * 100).round(2)
-                        resumen['% Acumulado'] = resumen['% de Materiales'].cumsum().round(2)
-                        resumen['% Movimiento'] = (resumen['Total Movimientos'] / total_movimientos * 100).round(2)
-                        resumen['% de Movimiento acumulado'] = resumen['% Movimiento'].cumsum().round(2)
-                        
-# Ordenando por zona A, B, C
-                        resumen['Zona'] = pd.Categorical(resumen['Zona'], categories=['A', 'B', 'C'], ordered=True)
-                        resumen = resumen.sort_values('Zona')
-                        
-# Mostrando solo columnas solicitadas
-                        resumen_final = resumen[['Zona', 'Nro de Materiales', '% de Materiales', 
-                                                  '% Acumulado', '% Movimiento', '% de Movimiento acumulado']]
-                        
-                        st.dataframe(resumen_final, use_container_width=True, hide_index=True)
-                        
 # Gráfico ABC (generado)
-                        
-                        st.write("---")
-                        st.subheader("📈 Gráfico Análisis ABC")
-                        
-                        fig = make_subplots(specs=[[{"secondary_y": True}]])
-                        
-                        colores = {'A': 'green', 'B': 'gold', 'C': 'red'}
-                        colores_mapeados = resumen['Zona'].map(colores)
-                        fig.add_trace(
-                            go.Bar(
-                                x=resumen['Zona'],
-                                y=resumen['% Movimiento'],
-                                name='% Movimiento',
-                                marker_color=colores_mapeados,
-                                text=resumen['% Movimiento'].apply(lambda x: f'{x:.1f}%'),
-                                textposition='auto'
-                            ),
-                            secondary_y=False
-                        )
-                        
-# Línea para % Movimiento Acumulado
-                        fig.add_trace(
-                            go.Scatter(
-                                x=resumen['Zona'],
-                                y=resumen['% de Movimiento acumulado'],
-                                name='% Movimiento Acumulado',
-                                mode='lines+markers+text',
-                                line=dict(color='blue', width=3),
-                                marker=dict(size=10),
-                                text=resumen['% de Movimiento acumulado'].apply(lambda x: f'{x:.1f}%'),
-                                textposition='top center'
-                            ),
-                            secondary_y=True
-                        )
-                        
-                        fig.update_layout(
-                            title=f'Análisis ABC - {area_seleccionada}',
-                            xaxis_title='Zona',
-                            height=500,
-                            showlegend=True,
-                            legend=dict(x=0.7, y=1.15, orientation='h')
-                        )
-                        
-                        fig.update_yaxes(title_text="% Movimiento", secondary_y=False, range=[0, 120], dtick=10)
-                        fig.update_yaxes(title_text="% Movimiento Acumulado", secondary_y=True, range=[0, 120], dtick=10)
-                        
-                        st.plotly_chart(fig, use_container_width=True)
-                        
+            
+            st.write("---")
+            st.subheader("📈 Gráfico Análisis ABC")
+            
+            st.plotly_chart(resultado['fig'], use_container_width=True)
+            
 # Opción de descargar
-                        
-                        st.write("---")
-                       
-                        from openpyxl import load_workbook
-                        from openpyxl.drawing.image import Image as XLImage
-
-# --- Recrear el gráfico ABC con matplotlib ---
-                        fig_mpl, ax1 = plt.subplots(figsize=(12, 5), facecolor='white')
-                        ax1.set_facecolor('white')
-
-                        zonas = resumen_final['Zona'].tolist()
-                        porcentajes = resumen_final['% Movimiento'].tolist()
-                        acumulados = resumen_final['% de Movimiento acumulado'].tolist()
-
-                        colores = ['green' if z == 'A' else 'gold' if z == 'B' else 'red' for z in zonas]
-
-                        x = np.arange(len(zonas))
-
-# Barras más anchas (igual que Plotly)
-                        bars = ax1.bar(x, porcentajes, color=colores, width=0.6, label='% Movimiento')
-
-# Etiquetas DENTRO de las barras, centradas verticalmente (igual que Plotly)
-                        for bar, val in zip(bars, porcentajes):
-                            bar_height = bar.get_height()
-    # Solo pone texto dentro si la barra es suficientemente alta
-                            if bar_height > 8:
-                                ax1.text(bar.get_x() + bar.get_width() / 2, bar_height / 2,
-                                         f'{val:.1f}%', ha='center', va='center',
-                                         fontsize=10, color='white', fontweight='bold')
-                            else:
-                                ax1.text(bar.get_x() + bar.get_width() / 2, bar_height + 1,
-                                         f'{val:.1f}%', ha='center', va='bottom',
-                                         fontsize=10, color='black')
-
-# Grid gris claro (igual que Plotly)
-                        ax1.yaxis.grid(True, color='lightgrey', linestyle='-', linewidth=0.7)
-                        ax1.set_axisbelow(True)
-                        ax1.spines['top'].set_visible(False)
-                        ax1.spines['right'].set_visible(False)
-                        
-                        ax1.set_ylim(0, 120)
-                        ax1.set_yticks(range(0, 121, 10))
-                        ax1.set_ylabel('% Movimiento')
-                        ax1.set_xticks(x)
-                        ax1.set_xticklabels(zonas)
-                        ax1.set_xlabel('Zona')
-                        ax1.set_title(f'Análisis ABC - {area_seleccionada}', fontsize=13, loc='left', fontweight='bold')
-
-# Eje Y derecho
-                        ax2 = ax1.twinx()
-                        ax2.plot(x, acumulados, color='blue', linewidth=3,
-                                 marker='o', markersize=8, label='% Movimiento Acumulado', zorder=5)
-
-# Etiquetas línea ARRIBA de cada punto (igual que Plotly textposition='top center')
-                        for i, val in enumerate(acumulados):
-                            ax2.text(i, val + 3, f'{val:.1f}%', ha='center', va='bottom',
-                                     fontsize=10, color='blue')
-                        
-                        ax2.set_ylim(0, 120)
-                        ax2.set_yticks(range(0, 121, 10))
-                        ax2.set_ylabel('% Movimiento Acumulado')
-                        ax2.spines['top'].set_visible(False)
-
-# Leyenda horizontal FUERA del gráfico, arriba a la derecha (igual que Plotly)
-                        patch_bar = mpatches.Patch(color='green', label='% Movimiento')
-                        line_acum = Line2D([0], [0], color='blue', linewidth=2,
-                                           marker='o', markersize=7, label='% Movimiento Acumulado')
-                        ax1.legend(handles=[patch_bar, line_acum],
-                                   loc='upper left',
-                                   bbox_to_anchor=(0.65, 1.12),
-                                   ncol=2, fontsize=9, frameon=True)
-                        
-                        plt.tight_layout()
-
-# Guardar figura en buffer
-                        img_stream = io.BytesIO()
-                        fig_mpl.savefig(img_stream, format='png', dpi=150, bbox_inches='tight')
-                        img_stream.seek(0)
-                        plt.close(fig_mpl)
-
-# --- Generar Excel ---
-                        output = io.BytesIO()
-                        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                            df[columnas_proceso].to_excel(writer, sheet_name='Análisis ABC', index=False)
-                            resumen_final.to_excel(writer, sheet_name='Resumen ABC', index=False)
-
-                        output.seek(0)
-                        wb = load_workbook(output)
-                        ws = wb['Resumen ABC']
-
-                        xl_img = XLImage(img_stream)
-                        xl_img.anchor = 'A10'
-                        ws.add_image(xl_img)
+            
+            st.write("---")
+            
+            st.download_button(
+                label="📥 Descargar tabla completa (Excel)",
+                data=excel_al_descargar(df, resultado['resumen'], f'Análisis ABC - {area_resultado}', diagnostico,
+                                        diagnostico_descarga),
+                file_name=f'analisis_abc_{area_resultado}.xlsx',
+                mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                on_click='ignore'
+            )
+            
+# Escenarios: zonas con otra métrica u otros cortes, a partir de la misma tabla y sin reprocesar
+            with st.expander("🔀 Escenarios ABC (métricas y cortes)"):
+                metricas = metricas_escenario(df)
+                metricas_sel = st.multiselect("Métricas:", list(metricas), default=list(metricas))
+                col_corte_a, col_corte_b = st.columns(2)
+                with col_corte_a:
+                    cortes_a = st.multiselect("Corte A (%):", [60, 65, 70, 75, 80, 85, 90], default=[70, 75, 80, 85])
+                with col_corte_b:
+                    cortes_b = st.multiselect("Corte B (%):", [85, 90, 95, 97, 99], default=[90, 95])
+                umbrales = [(a, b) for a in sorted(cortes_a) for b in sorted(cortes_b) if a < b]
+                
+                if metricas_sel and umbrales:
+                    with diagnostico.etapa('escenarios ABC', len(df)) as medida:
+                        barrido = barrido_abc(df, {m: metricas[m] for m in metricas_sel}, umbrales)
+                        medida['filas_salida'] = len(barrido.comparacion)
+                    st.caption(f"Base: Cant. Mov. con cortes {UMBRALES_ZONAS[0]}/{UMBRALES_ZONAS[1]}. "
+                               "\"Cambian de zona\" cuenta los materiales con otra zona que en la base.")
+                    st.dataframe(barrido.comparacion, use_container_width=True, hide_index=True)
+                    st.write("**Migraciones de zona respecto a la base:**")
+                    st.dataframe(barrido.migraciones, use_container_width=True, hide_index=True)
+                else:
+                    st.info("Elige al menos una métrica y un par de cortes con A menor que B.")
 
-                        final_output = io.BytesIO()
-                        wb.save(final_output)
-                        excel_data = final_output.getvalue()
+# Tiempo, filas y memoria de cada etapa de esta ejecución
+    with st.expander("🩺 Diagnóstico"):
+        tabla_diagnostico = diagnostico.tabla()
+        st.caption(f"Tiempo total medido: {tabla_diagnostico['segundos'].sum():.2f} s. "
+                   "Memoria: variación de la memoria residente del proceso en cada etapa.")
+        st.dataframe(tabla_diagnostico, use_container_width=True, hide_index=True)
+        if diagnostico_descarga.etapas:
+            st.caption("Última descarga de Excel (el gráfico y el libro se generan al pulsar el botón; "
+                       "aparecen aquí a partir de la siguiente ejecución).")
+            st.dataframe(diagnostico_descarga.tabla(), use_container_width=True, hide_index=True)
+        st.caption("Memoria de las hojas cargadas, antes y después de compactar los tipos.")
+        st.dataframe(memoria_hojas, use_container_width=True, hide_index=True)
 
-                        st.download_button(
-                            label="📥 Descargar tabla completa (Excel)",
-                            data=excel_data,
-                            file_name=f'analisis_abc_{area_seleccionada}.xlsx',
-                            mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                        )
+# Procesamiento por lotes: todas las combinaciones (o las elegidas) en una sola pasada
+    with st.expander("📦 Procesamiento por lotes"):
+        opciones_quien_compra_lote = indice_filtros.quien_compra()
+        lote_quien_compra = st.multiselect("Quien Compra (lote):", opciones_quien_compra_lote, default=opciones_quien_compra_lote)
+        opciones_tipos_material_lote = indice_filtros.tipos_material()
+        lote_tipos_material = st.multiselect("Tipo Material (lote):", opciones_tipos_material_lote, default=opciones_tipos_material_lote)
+        opciones_areas_lote = indice_filtros.areas()
+        lote_areas = st.multiselect("Área Solicitante (lote):", opciones_areas_lote, default=opciones_areas_lote)
+        
+        combinaciones = combinaciones_disponibles(zm009, lote_quien_compra, lote_tipos_material, lote_areas)
+        st.write(f"**Combinaciones a procesar:** {len(combinaciones)}")
+        
+        # Como el resultado principal, el lote se guarda en la sesión y sigue visible en las
+        # siguientes ejecuciones mientras no cambien el archivo, las combinaciones o los años
+        clave_lote = (huella_archivo, tuple(combinaciones), tuple(anios_seleccionados))
+        if st.button("Procesar todas las combinaciones", disabled=len(combinaciones) == 0):
+            with st.spinner(f"Procesando {len(combinaciones)} combinaciones, espere..."):
+                resultados_lote = procesar_lote(zm009, agregados, combinaciones, anios_seleccionados)
+                st.session_state['resultado_lote'] = {
+                    'clave': clave_lote,
+                    'resultados': resultados_lote,
+                    'indice': tabla_resumen_lote(resultados_lote),
+                }
+        
+        resultado_lote = st.session_state.get('resultado_lote')
+        if resultado_lote is not None and resultado_lote['clave'] == clave_lote:
+            resultados_lote = resultado_lote['resultados']
+            st.dataframe(resultado_lote['indice'], use_container_width=True, hide_index=True)
+            st.download_button(
+                label="📥 Descargar lote completo (Excel)",
+                data=lambda: libro_lote_excel(resultados_lote),
+                file_name='analisis_abc_lote.xlsx',
+                mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                on_click='ignore'
+            )
 
 
 
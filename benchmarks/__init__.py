@@ -0,0 +1 @@
+"""Mediciones de rendimiento con libros SAP sintéticos."""
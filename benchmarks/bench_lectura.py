@@ -0,0 +1,53 @@
+"""Compara los lectores de Excel sobre libros sintéticos.
+
+Uso:
+    python -m benchmarks.bench_lectura --filas 50000 200000
+"""
+
+import argparse
+import io
+import time
+
+import pandas as pd
+
+from analisis_abc.ingesta import MOTORES, leer_libro_sap
+from benchmarks.sinteticos import generar_libro
+
+
+def leer_como_antes(datos):
+    """Las tres llamadas a pd.read_excel que hacía app.py originalmente."""
+    return [pd.read_excel(io.BytesIO(datos), sheet_name=hoja) for hoja in ('ZMM009', 'MB51', 'SC')]
+
+
+def medir(funcion, *args, **kwargs):
+    inicio = time.perf_counter()
+    funcion(*args, **kwargs)
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, nargs='+', default=[50_000, 200_000],
+                        help='filas de MB51 de cada libro sintético')
+    parser.add_argument('--motores', nargs='+', default=list(MOTORES), choices=MOTORES)
+    parser.add_argument('--procesos', type=int, default=3,
+                        help='procesos para la variante en paralelo (1 para omitirla)')
+    args = parser.parse_args()
+
+    for filas in args.filas:
+        datos = generar_libro(filas)
+        print(f"\nMB51 = {filas} filas ({len(datos) / 1e6:.1f} MB)")
+
+        base = medir(leer_como_antes, datos)
+        print(f"  {'original (3x read_excel)':<32}{base:8.2f} s")
+        for motor in args.motores:
+            variantes = [(motor, 1)]
+            if args.procesos > 1:
+                variantes.append((f'{motor} x{args.procesos} procesos', args.procesos))
+            for nombre, procesos in variantes:
+                segundos = medir(leer_libro_sap, datos, motor=motor, procesos=procesos)
+                print(f"  {nombre:<32}{segundos:8.2f} s  ({base / segundos:5.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
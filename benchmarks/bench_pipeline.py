@@ -0,0 +1,164 @@
+"""Mide cada etapa del pipeline ABC sobre hojas SAP sintéticas de distintos tamaños.
+
+Uso:
+    python -m benchmarks.bench_pipeline --filas 10000 100000 1000000 --json resultados.json
+    python -m benchmarks.bench_pipeline --filas 100000 --comparar resultados.json
+
+Cada etapa se ejecuta dos veces: una para medir el tiempo y otra bajo
+tracemalloc para medir el pico de memoria, así la medición de memoria no
+infla el tiempo.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+from analisis_abc.exportar import libro_excel_abc
+from analisis_abc.graficos import figura_abc, imagen_abc_png, vaciar_cache_imagenes
+from analisis_abc.ingesta import leer_libro_sap
+from analisis_abc.movimientos import construir_indice_movimientos
+from analisis_abc.proceso import (
+    COLUMNAS_RESUMEN,
+    agregar_movimientos,
+    calcular_cantidad_a_comprar,
+    clasificar_abc,
+    quitar_con_solicitud,
+    resumen_abc,
+)
+from analisis_abc.solicitudes import construir_indice_solicitudes
+from analisis_abc.stock import construir_tabla_stock
+from benchmarks.sinteticos import generar_hojas, generar_libro
+
+# Una hoja de Excel admite como máximo 1.048.576 filas, encabezado incluido
+MAX_FILAS_EXCEL = 1_048_575
+
+# Al comparar con un JSON anterior, una etapa es regresión si tarda un 20 % más
+# y al menos 50 ms más (por debajo de eso manda el ruido de medición)
+UMBRAL_REGRESION = 1.2
+MINIMO_REGRESION_SEGUNDOS = 0.05
+
+
+def medir(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    segundos = time.perf_counter() - inicio
+
+    tracemalloc.start()
+    funcion(*args)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, {'segundos': round(segundos, 4), 'pico_mb': round(pico / 2**20, 2)}
+
+
+def _imagen_sin_cache(resumen, titulo):
+    vaciar_cache_imagenes()
+    return imagen_abc_png(resumen, titulo)
+
+
+def _filas(objeto):
+    if isinstance(objeto, tuple):
+        return sum(len(parte) for parte in objeto)
+    return len(objeto) if hasattr(objeto, '__len__') and not isinstance(objeto, bytes) else None
+
+
+def medir_pipeline(filas_mb51, con_ingesta=True, semilla=0):
+    """Devuelve {etapa: {'segundos', 'pico_mb', 'filas_entrada', 'filas_salida'}}."""
+    etapas = {}
+
+    def etapa(nombre, funcion, *args, filas_entrada=None):
+        resultado, medida = medir(funcion, *args)
+        medida['filas_entrada'] = filas_entrada
+        medida['filas_salida'] = _filas(resultado)
+        etapas[nombre] = medida
+        return resultado
+
+    if con_ingesta and filas_mb51 <= MAX_FILAS_EXCEL:
+        datos = generar_libro(filas_mb51, semilla=semilla)
+        zm009, mb51, sc = etapa('ingesta', leer_libro_sap, datos, filas_entrada=filas_mb51)
+    else:
+        zm009, mb51, sc = generar_hojas(filas_mb51, semilla=semilla)
+
+    # Stock y cantidad a comprar sobre todo ZMM009, como en el procesamiento por lotes
+    tabla_stock = etapa('stock: tabla', construir_tabla_stock, zm009, filas_entrada=len(zm009))
+    df = etapa('stock: cant a comp.', calcular_cantidad_a_comprar, zm009, tabla_stock, filas_entrada=len(zm009))
+
+    indice_solicitudes = etapa('sc: índice', construir_indice_solicitudes, sc, filas_entrada=len(sc))
+    df = etapa('sc: búsqueda', quitar_con_solicitud, df, indice_solicitudes, filas_entrada=len(df))
+
+    indice_movimientos = etapa('movimientos: índice', construir_indice_movimientos, mb51, filas_entrada=len(mb51))
+    df = etapa('movimientos: columnas', agregar_movimientos, df, indice_movimientos, filas_entrada=len(df))
+
+    df = etapa('abc: zonas', clasificar_abc, df, filas_entrada=len(df))
+    resumen = etapa('abc: resumen', resumen_abc, df, filas_entrada=len(df))[COLUMNAS_RESUMEN]
+
+    etapa('gráfico: plotly', figura_abc, resumen, 'Análisis ABC - benchmark')
+    imagen_png = etapa('gráfico: matplotlib', _imagen_sin_cache, resumen, 'Análisis ABC - benchmark')
+    etapa('exportar: excel', libro_excel_abc, df, resumen, imagen_png, filas_entrada=len(df))
+    return etapas
+
+
+def _version():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def imprimir(filas_mb51, etapas, anterior=None):
+    print(f"\nMB51 = {filas_mb51} filas")
+    print(f"  {'etapa':<26}{'segundos':>10}{'pico MB':>10}{'filas':>10}")
+    for nombre, medida in etapas.items():
+        linea = f"  {nombre:<26}{medida['segundos']:>10.3f}{medida['pico_mb']:>10.1f}{medida['filas_salida'] or '':>10}"
+        previa = (anterior or {}).get(nombre)
+        if previa and previa['segundos'] > 0:
+            relacion = medida['segundos'] / previa['segundos']
+            regresion = (relacion > UMBRAL_REGRESION and
+                         medida['segundos'] - previa['segundos'] > MINIMO_REGRESION_SEGUNDOS)
+            linea += f"  x{relacion:.2f} vs anterior" + ("  <- REGRESIÓN" if regresion else "")
+        print(linea)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, nargs='+', default=[10_000, 100_000],
+                        help='filas de MB51 de cada ejecución (10k a 2M)')
+    parser.add_argument('--sin-ingesta', action='store_true',
+                        help='no generar ni leer el .xlsx (la ingesta se omite siempre por encima del límite de Excel)')
+    parser.add_argument('--json', help='guardar los resultados en este archivo')
+    parser.add_argument('--comparar', help='JSON de una ejecución anterior para comparar tiempos')
+    args = parser.parse_args()
+
+    anteriores = {}
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anteriores = {r['filas_mb51']: r['etapas'] for r in json.load(f)['resultados']}
+
+    resultados = []
+    for filas in args.filas:
+        etapas = medir_pipeline(filas, con_ingesta=not args.sin_ingesta)
+        imprimir(filas, etapas, anteriores.get(filas))
+        resultados.append({'filas_mb51': filas, 'etapas': etapas})
+
+    if args.json:
+        informe = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'version': _version(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'resultados': resultados,
+        }
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(informe, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados guardados en {args.json}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
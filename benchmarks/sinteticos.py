@@ -0,0 +1,74 @@
+"""Generador de hojas ZMM009, MB51 y SC sintéticas con las columnas que lee la aplicación."""
+
+import io
+
+import numpy as np
+import pandas as pd
+
+TIPOS_MATERIAL = ['ZREP', 'ZCON', 'ZHER', 'ZSEG']
+ALMACENES = ['1000', '1001', '1002', '2000', '2001', '3000']
+QUIEN_COMPRA = ['Logística', 'Mantenimiento', 'Operaciones']
+AREAS = ['Planta', 'Taller', 'Almacén Central', 'Subestación', 'Oficina', 'Laboratorio']
+EJERCICIOS = [2022, 2023, 2024, 2025, 2026]
+
+
+def generar_hojas(filas_mb51, materiales=None, semilla=0):
+    """Devuelve (zm009, mb51, sc) con `filas_mb51` movimientos.
+
+    Por defecto hay un material por cada 20 movimientos, cada material en
+    uno o dos almacenes, y una solicitud de pedido para uno de cada cuatro.
+    """
+    rng = np.random.default_rng(semilla)
+    materiales = materiales or max(filas_mb51 // 20, 10)
+    codigos = np.arange(10_000_000, 10_000_000 + materiales)
+    tipo_por_material = rng.choice(TIPOS_MATERIAL, materiales)
+
+    filas_zm009 = int(materiales * 1.5)
+    posiciones = rng.integers(0, materiales, filas_zm009)
+    anteriores = np.where(rng.random(materiales) < 0.4, rng.integers(1, materiales, materiales), np.nan)
+    maximos = rng.integers(0, 60, filas_zm009).astype(float)
+    zm009 = pd.DataFrame({
+        'Material': codigos[posiciones],
+        'Nºmaterial ant.': anteriores[posiciones],
+        'Denominación': [f'REPUESTO {c}' for c in codigos[posiciones]],
+        'Quien Compra': rng.choice(QUIEN_COMPRA, filas_zm009),
+        'Area Solicitantes': rng.choice(AREAS, filas_zm009),
+        'Stock Máximo': np.where(rng.random(filas_zm009) < 0.1, np.nan, maximos),
+        'Stock Mínimo': np.minimum(rng.integers(0, 15, filas_zm009), maximos),
+        'Tipo material': tipo_por_material[posiciones],
+        'Stock Total': rng.integers(0, 40, filas_zm009),
+        'Stock Real': rng.integers(0, 40, filas_zm009),
+        'UM base': rng.choice(['UN', 'KG', 'M'], filas_zm009),
+        'Almacén': rng.choice(ALMACENES, filas_zm009),
+    })
+
+    # Pocos materiales concentran la mayoría de los movimientos, como en un ABC real
+    pesos = 1 / np.arange(1, materiales + 1) ** 0.8
+    movidos = rng.choice(materiales, filas_mb51, p=pesos / pesos.sum())
+    mb51 = pd.DataFrame({
+        'Material': codigos[movidos],
+        'Tipo material': tipo_por_material[movidos],
+        'Indicador Debe/Haber': rng.choice(['S', 'H'], filas_mb51),
+        'Ejerc.documento mat.': rng.choice(EJERCICIOS, filas_mb51),
+        'Cantidad': rng.integers(1, 50, filas_mb51).astype(float),
+        'Doc.mat.': 4_900_000_000 + np.arange(filas_mb51) // 3,
+        'Pos.': np.arange(filas_mb51) % 3 + 1,
+    })
+
+    con_solicitud = rng.choice(codigos, materiales // 4, replace=False)
+    sc = pd.DataFrame({
+        'Cod. SAP': con_solicitud,
+        'Solicitud \nPedido': rng.integers(10_000_000, 20_000_000, len(con_solicitud)),
+    })
+    return zm009, mb51, sc
+
+
+def generar_libro(filas_mb51, materiales=None, semilla=0):
+    """Devuelve los bytes de un libro .xlsx con las hojas ZMM009, MB51 y SC."""
+    zm009, mb51, sc = generar_hojas(filas_mb51, materiales, semilla)
+    salida = io.BytesIO()
+    with pd.ExcelWriter(salida) as writer:
+        zm009.to_excel(writer, sheet_name='ZMM009', index=False)
+        mb51.to_excel(writer, sheet_name='MB51', index=False)
+        sc.to_excel(writer, sheet_name='SC', index=False)
+    return salida.getvalue()
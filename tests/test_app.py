@@ -0,0 +1,125 @@
+"""Aplicación Streamlit ejecutada con AppTest sobre un libro sintético."""
+
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from analisis_abc import combinaciones_disponibles, construir_agregados, leer_libro_sap, procesar_area
+from benchmarks.sinteticos import generar_libro
+
+AppTest = pytest.importorskip('streamlit.testing.v1').AppTest
+
+APP = Path(__file__).resolve().parent.parent / 'app.py'
+
+# AppTest no sube archivos: el script sustituye st.file_uploader por el libro de la prueba
+SCRIPT = '''
+import io
+import os
+
+import streamlit as st
+
+
+class _Archivo(io.BytesIO):
+    name = 'sintetico.xlsx'
+
+
+with open(os.environ['ANALISIS_ABC_PRUEBA_LIBRO'], 'rb') as f:
+    _datos = f.read()
+_file_uploader = st.file_uploader
+st.file_uploader = lambda *args, **kwargs: _Archivo(_datos)
+try:
+    with open(os.environ['ANALISIS_ABC_PRUEBA_APP'], encoding='utf-8') as f:
+        exec(compile(f.read(), 'app.py', 'exec'))
+finally:
+    st.file_uploader = _file_uploader
+'''
+
+FILAS_MB51 = 3000
+
+
+@pytest.fixture(scope='module')
+def libro(tmp_path_factory):
+    ruta = tmp_path_factory.mktemp('libro') / 'sintetico.xlsx'
+    ruta.write_bytes(generar_libro(FILAS_MB51))
+    return ruta
+
+
+@pytest.fixture
+def sesion(libro, tmp_path, monkeypatch):
+    monkeypatch.setenv('ANALISIS_ABC_PRUEBA_LIBRO', str(libro))
+    monkeypatch.setenv('ANALISIS_ABC_PRUEBA_APP', str(APP))
+    monkeypatch.setenv('ANALISIS_ABC_HISTORIAL', str(tmp_path / 'historial'))
+
+    def nueva():
+        at = AppTest.from_string(SCRIPT, default_timeout=120).run()
+        assert not at.exception
+        return at
+    return nueva
+
+
+def combinacion_con_resultado(libro):
+    zm009, mb51, sc = leer_libro_sap(libro.read_bytes())
+    agregados = construir_agregados(zm009, mb51, sc)
+    for combinacion in combinaciones_disponibles(zm009):
+        resultado = procesar_area(zm009, agregados, *combinacion)
+        if resultado.resumen is not None and resultado.tabla['Cant. Mov.'].sum() > 0:
+            return combinacion, int(resultado.tabla['Cant. Mov.'].sum())
+    pytest.fail('El libro sintético no tiene ninguna combinación con movimientos')
+
+
+def usar_historial(at):
+    next(c for c in at.checkbox if 'historial' in c.label).check().run()
+    assert not at.exception
+    return [i.value for i in at.info if 'historial' in i.value]
+
+
+def total_cant_mov(at, combinacion):
+    for selectbox, valor in zip(at.selectbox, combinacion):
+        selectbox.set_value(valor).run()
+    next(b for b in at.button if b.label == 'Procesar Datos').click().run()
+    assert not at.exception
+    tabla = next(d.value for d in at.dataframe if 'Cant. Mov.' in d.value.columns)
+    return int(tabla['Cant. Mov.'].sum())
+
+
+def test_historial_borrado_se_vuelve_a_cargar(sesion, libro, tmp_path):
+    combinacion, esperado = combinacion_con_resultado(libro)
+    carpeta = tmp_path / 'historial'
+
+    primera = sesion()
+    assert usar_historial(primera) == [f"Movimientos nuevos agregados al historial: {FILAS_MB51}"]
+    assert total_cant_mov(primera, combinacion) == esperado
+
+    # Otra sesión del mismo proceso con el mismo archivo no vuelve a agregar nada
+    assert usar_historial(sesion()) == ["Movimientos nuevos agregados al historial: 0"]
+
+    # Con la carpeta borrada, el archivo se vuelve a guardar y el índice no queda vacío
+    shutil.rmtree(carpeta)
+    segunda = sesion()
+    assert usar_historial(segunda) == [f"Movimientos nuevos agregados al historial: {FILAS_MB51}"]
+    assert (carpeta / 'indice.parquet').exists()
+    assert total_cant_mov(segunda, combinacion) == esperado
+
+
+def tabla_lote(at):
+    return next((d.value for d in at.dataframe if 'Zona A' in d.value.columns), None)
+
+
+def test_lote_sigue_visible_en_otras_ejecuciones(sesion):
+    at = sesion()
+    next(b for b in at.button if b.label == 'Procesar todas las combinaciones').click().run()
+    assert not at.exception
+    lote = tabla_lote(at)
+    assert lote is not None
+
+    # Otra interacción vuelve a ejecutar el script sin pulsar el botón del lote
+    next(b for b in at.button if b.label == 'Procesar Datos').click().run()
+    pd.testing.assert_frame_equal(tabla_lote(at), lote)
+    assert any('lote' in d.label for d in at.get('download_button'))
+
+    # Con otras combinaciones el lote guardado ya no corresponde
+    areas = next(m for m in at.multiselect if m.label == 'Área Solicitante (lote):')
+    areas.set_value(areas.value[:1]).run()
+    assert tabla_lote(at) is None
@@ -0,0 +1,113 @@
+"""Historial MB51: cargas que fallan a medias, varios procesos a la vez y códigos de material mixtos."""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analisis_abc import (
+    HistorialMovimientos,
+    LibroSAP,
+    agregar_movimientos,
+    compactar_libro,
+    construir_indice_movimientos,
+)
+from benchmarks.sinteticos import EJERCICIOS, generar_hojas
+
+
+def indice_ordenado(indice):
+    indice = indice.astype({'Material': 'int64', 'Tipo material': object, 'Indicador Debe/Haber': object,
+                            'Ejerc.documento mat.': 'float64', 'Registros': 'int64', 'Cantidad': 'float64'})
+    return indice.sort_values(list(indice.columns[:4])).reset_index(drop=True)
+
+
+def comprobar_indice_completo(historial):
+    esperado = construir_indice_movimientos(historial.movimientos())
+    pd.testing.assert_frame_equal(indice_ordenado(historial.indice()), indice_ordenado(esperado))
+
+
+@pytest.fixture
+def mb51():
+    _, mb51, _ = generar_hojas(600)
+    return mb51[mb51['Ejerc.documento mat.'].isin([2023, 2024])].reset_index(drop=True)
+
+
+def test_fallo_al_escribir_una_particion(tmp_path, mb51, monkeypatch):
+    historial = HistorialMovimientos(tmp_path)
+    escribir = pd.DataFrame.to_parquet
+    llamadas = []
+
+    def falla_en_la_segunda(df, ruta, *args, **kwargs):
+        llamadas.append(ruta)
+        if len(llamadas) == 2:
+            raise OSError('disco lleno')
+        return escribir(df, ruta, *args, **kwargs)
+
+    monkeypatch.setattr(pd.DataFrame, 'to_parquet', falla_en_la_segunda)
+    with pytest.raises(OSError):
+        historial.agregar(mb51)
+    monkeypatch.undo()
+
+    # No queda ninguna parte de la carga fallida y se puede repetir entera
+    assert list(tmp_path.rglob('*.parquet*')) == []
+    assert historial.agregar(mb51) == len(mb51)
+    comprobar_indice_completo(historial)
+
+
+def test_fallo_al_escribir_el_indice(tmp_path, mb51, monkeypatch):
+    historial = HistorialMovimientos(tmp_path)
+    primera = mb51[mb51['Ejerc.documento mat.'] == 2023]
+    assert historial.agregar(primera) == len(primera)
+
+    def falla(*args, **kwargs):
+        raise OSError('disco lleno')
+
+    monkeypatch.setattr(HistorialMovimientos, '_escribir_indice', falla)
+    with pytest.raises(OSError):
+        historial.agregar(mb51)
+    monkeypatch.undo()
+
+    # Los movimientos de la carga ya renombrados se suman al índice al leerlo
+    comprobar_indice_completo(historial)
+    assert historial.agregar(mb51) == 0
+    comprobar_indice_completo(historial)
+
+
+def agregar_por_partes(carpeta, partes):
+    historial = HistorialMovimientos(carpeta)
+    return sum(historial.agregar(parte) for parte in partes)
+
+
+def test_varios_procesos_en_la_misma_carpeta(tmp_path, mb51):
+    partes = [mb51.iloc[posiciones] for posiciones in np.array_split(np.arange(len(mb51)), 12)]
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        agregados = list(executor.map(agregar_por_partes, [tmp_path] * 2, [partes[0::2], partes[1::2]]))
+
+    # Ninguna carga pisa el índice de otra
+    assert sum(agregados) == len(mb51)
+    historial = HistorialMovimientos(tmp_path)
+    assert len(historial.movimientos()) == len(mb51)
+    comprobar_indice_completo(historial)
+
+
+def test_material_con_codigos_numericos_y_alfanumericos(tmp_path):
+    zm009, mb51, sc = generar_hojas(600)
+    # Como lo deja pd.read_excel: números para los códigos numéricos y textos para el resto
+    alfanumericos = {m: f'R-{m}' for m in zm009['Material'].unique()[::3]}
+    zm009['Material'] = zm009['Material'].map(lambda m: alfanumericos.get(m, m)).astype(object)
+    mb51['Material'] = mb51['Material'].map(lambda m: alfanumericos.get(m, m)).astype(object)
+    zm009, mb51, sc = compactar_libro(LibroSAP(zm009, mb51, sc))
+
+    historial = HistorialMovimientos(tmp_path)
+    assert historial.agregar(mb51) == len(mb51)
+    assert historial.agregar(mb51) == 0
+
+    guardados = historial.movimientos().set_index(['Doc.mat.', 'Pos.']).loc[
+        list(zip(mb51['Doc.mat.'], mb51['Pos.'])), 'Material']
+    assert guardados.tolist() == mb51['Material'].tolist()
+    assert [type(m) for m in guardados] == [type(m) for m in mb51['Material']]
+
+    esperado = agregar_movimientos(zm009, construir_indice_movimientos(mb51), EJERCICIOS)
+    obtenido = agregar_movimientos(zm009, historial.indice(), EJERCICIOS)
+    pd.testing.assert_frame_equal(obtenido.astype(object), esperado.astype(object))
@@ -0,0 +1,23 @@
+"""Los tres lectores del libro SAP devuelven las mismas hojas."""
+
+import pandas as pd
+import pytest
+
+from analisis_abc import leer_libro_sap
+from analisis_abc.ingesta import HOJAS
+from benchmarks.sinteticos import generar_libro
+
+
+@pytest.fixture(scope='module')
+def libro():
+    return generar_libro(2_000)
+
+
+@pytest.mark.parametrize('motor', ['calamine', 'openpyxl-stream'])
+def test_mismas_hojas_que_read_excel(libro, motor):
+    if motor == 'calamine':
+        pytest.importorskip('python_calamine')
+    esperado = leer_libro_sap(libro, motor='openpyxl', compactar=False)
+    obtenido = leer_libro_sap(libro, motor=motor, compactar=False)
+    for hoja, a, b in zip(HOJAS, obtenido, esperado):
+        pd.testing.assert_frame_equal(a, b, obj=hoja)
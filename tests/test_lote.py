@@ -0,0 +1,32 @@
+"""Procesamiento por lotes: mismos conteos que procesar_area para cada combinación."""
+
+import pandas as pd
+
+from analisis_abc import (
+    CONTEOS_FILTRO,
+    LibroSAP,
+    combinaciones_disponibles,
+    compactar_libro,
+    construir_agregados,
+    procesar_area,
+    procesar_lote,
+    tabla_resumen_lote,
+)
+from benchmarks.sinteticos import generar_hojas
+
+
+def test_conteos_de_todas_las_etapas():
+    zm009, mb51, sc = compactar_libro(LibroSAP(*generar_hojas(3_000)))
+    agregados = construir_agregados(zm009, mb51, sc)
+    combinaciones = combinaciones_disponibles(zm009)
+    resultados = procesar_lote(zm009, agregados, combinaciones)
+
+    for combinacion, resultado in resultados.items():
+        assert resultado.conteos == procesar_area(zm009, agregados, *combinacion).conteos
+        assert list(resultado.conteos) == CONTEOS_FILTRO
+    # Hay combinaciones que se quedan sin materiales antes del último filtro
+    assert any(r.conteos['Sin solicitud de pedido'] == 0 for r in resultados.values())
+
+    indice = tabla_resumen_lote(resultados)
+    for columna in CONTEOS_FILTRO:
+        assert pd.api.types.is_integer_dtype(indice[columna])
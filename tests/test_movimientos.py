@@ -0,0 +1,110 @@
+"""Las columnas de movimientos del índice MB51 son las mismas que calculaba
+la versión original, que recorría MB51 una vez por material y columna."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analisis_abc import LibroSAP, agregar_columnas_movimiento, compactar_libro, construir_indice_movimientos
+from benchmarks.sinteticos import EJERCICIOS, generar_hojas
+
+
+def columnas_movimiento_por_fila(df, mb51, anios):
+    """Copia del cálculo original de app.py (df.apply sobre toda la hoja MB51)."""
+    df = df.copy()
+    df['Cant. Ingreso'] = df['Material'].apply(
+        lambda x: len(mb51[(mb51['Material'] == x) & (mb51['Indicador Debe/Haber'] == 'S')])
+    )
+    df['Cant Salida'] = df['Material'].apply(
+        lambda x: len(mb51[(mb51['Material'] == x) & (mb51['Indicador Debe/Haber'] == 'H')])
+    )
+    df['Ingreso y Salida'] = df['Material'].apply(
+        lambda x: len(mb51[mb51['Material'] == x])
+    )
+    for year in anios:
+        df[f'Ingreso {year}'] = df.apply(
+            lambda row: mb51[
+                (mb51['Material'] == row['Material']) &
+                (mb51['Indicador Debe/Haber'] == 'S') &
+                (mb51['Tipo material'] == row['Tipo material']) &
+                (mb51['Ejerc.documento mat.'] == year)
+            ]['Cantidad'].sum(),
+            axis=1
+        )
+        df[f'Salida {year}'] = df.apply(
+            lambda row: mb51[
+                (mb51['Material'] == row['Material']) &
+                (mb51['Indicador Debe/Haber'] == 'H') &
+                (mb51['Tipo material'] == row['Tipo material']) &
+                (mb51['Ejerc.documento mat.'] == year)
+            ]['Cantidad'].sum(),
+            axis=1
+        )
+    df['Cant. Ingreso. (501/561)'] = df.apply(
+        lambda row: mb51[
+            (mb51['Material'] == row['Material']) &
+            (mb51['Indicador Debe/Haber'] == 'S') &
+            (mb51['Tipo material'] == row['Tipo material'])
+        ]['Cantidad'].sum(),
+        axis=1
+    )
+    df['Cant. Salida.'] = df.apply(
+        lambda row: mb51[
+            (mb51['Material'] == row['Material']) &
+            (mb51['Indicador Debe/Haber'] == 'H') &
+            (mb51['Tipo material'] == row['Tipo material'])
+        ]['Cantidad'].sum(),
+        axis=1
+    )
+    df['Cant. Reg. Ingreso'] = df['Material'].apply(
+        lambda x: len(mb51[(mb51['Material'] == x) & (mb51['Indicador Debe/Haber'] == 'S')])
+    )
+    df['Cant. Reg. Salida'] = df['Material'].apply(
+        lambda x: len(mb51[(mb51['Material'] == x) & (mb51['Indicador Debe/Haber'] == 'H')])
+    )
+    return df
+
+
+def comprobar_igual_que_por_fila(zm009, mb51, anios, zm009_indice=None, mb51_indice=None):
+    esperado = columnas_movimiento_por_fila(zm009, mb51, anios)
+    obtenido = agregar_columnas_movimiento(
+        zm009 if zm009_indice is None else zm009_indice,
+        construir_indice_movimientos(mb51 if mb51_indice is None else mb51_indice),
+        anios,
+    )
+    columnas = esperado.columns.difference(zm009.columns, sort=False)
+    assert list(obtenido.columns[len(zm009.columns):]) == list(columnas)
+    pd.testing.assert_frame_equal(
+        obtenido[columnas].astype('float64').reset_index(drop=True),
+        esperado[columnas].astype('float64').reset_index(drop=True),
+    )
+
+
+def test_casos_limite():
+    zm009 = pd.DataFrame({
+        'Material': [100.0, 100.0, 200.0, 300.0, 400.0, np.nan, 500.0],
+        'Tipo material': ['ZREP', 'ZCON', 'ZREP', 'ZSOLO', 'ZHER', 'ZREP', np.nan],
+    })
+    mb51 = pd.DataFrame({
+        'Material': [100, 100, 100, 100, 100, 100, 200, 200, 200, np.nan, 400, 400, 500, 500],
+        'Tipo material': ['ZREP', 'ZREP', 'ZCON', np.nan, 'ZREP', 'ZREP', 'ZREP', 'ZREP', 'ZREP',
+                          'ZREP', 'ZHER', 'ZHER', 'ZREP', np.nan],
+        'Indicador Debe/Haber': ['S', 'H', 'S', 'H', np.nan, 'S', 'S', 'H', 'H', 'S', 'H', 'S', 'S', 'H'],
+        # 2022 queda fuera de la lista de años, pero cuenta en los totales
+        'Ejerc.documento mat.': [2023, 2024, 2024, 2023, 2023, np.nan, 2022, 2024, 2024, 2023, 2023, 2024,
+                                 2023, 2024],
+        # Salidas con signo negativo, como las registra SAP
+        'Cantidad': [5.0, -3.0, 7.0, -2.0, 4.0, 6.0, 8.0, -1.5, -2.5, 9.0, -4.0, 3.0, 1.0, -1.0],
+    })
+    comprobar_igual_que_por_fila(zm009, mb51, [2023, 2024])
+
+
+@pytest.mark.parametrize('compactar', [False, True])
+def test_hojas_sinteticas(compactar):
+    zm009, mb51, sc = generar_hojas(2_000)
+    zm009 = zm009[['Material', 'Tipo material']]
+    if compactar:
+        compacto = compactar_libro(LibroSAP(zm009, mb51, sc))
+        comprobar_igual_que_por_fila(zm009, mb51, EJERCICIOS, compacto.zm009, compacto.mb51)
+    else:
+        comprobar_igual_que_por_fila(zm009, mb51, EJERCICIOS)